@@ -0,0 +1,55 @@
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+ACCOUNTS_FILE = os.getenv("ACCOUNTS_FILE", "accounts.json")
+
+def _secret(config, key):
+    """Read key from config, or from the env var named by key_env (keeps secrets out of the file)."""
+    if config.get(key):
+        return config[key]
+    env_name = config.get(f"{key}_env")
+    return os.getenv(env_name, "") if env_name else ""
+
+def load_accounts(filename=ACCOUNTS_FILE):
+    """Load ivasms account configs.
+
+    ACCOUNTS_FILE holds a JSON list (or {"accounts": [...]}) of objects with
+    name, email, password (or password_env) and optional chat_id. Without the
+    file, a single "default" account is built from IVASMS_EMAIL,
+    IVASMS_PASSWORD and CHAT_ID so existing deployments keep working.
+    """
+    if os.path.exists(filename):
+        with open(filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        configs = data.get("accounts", []) if isinstance(data, dict) else data
+    else:
+        configs = [{
+            "name": "default",
+            "email": os.getenv("IVASMS_EMAIL", ""),
+            "password": os.getenv("IVASMS_PASSWORD", ""),
+        }]
+
+    accounts = []
+    seen = set()
+    for i, config in enumerate(configs):
+        name = str(config.get("name") or f"account{i + 1}")
+        if name in seen:
+            raise ValueError(f"Duplicate account name in {filename}: {name}")
+        seen.add(name)
+        accounts.append({
+            "name": name,
+            "email": _secret(config, "email"),
+            "password": _secret(config, "password"),
+            "chat_id": str(config.get("chat_id") or os.getenv("CHAT_ID", "")),
+            "state_path": config.get("state_path"),
+        })
+
+    logger.info(f"[ACCOUNTS] Loaded {len(accounts)} account(s): {', '.join(a['name'] for a in accounts)}")
+    return accounts
+
+def accounts_for_chat(accounts, chat_id):
+    """Return the names of the accounts whose SMS are sent to chat_id."""
+    return [account["name"] for account in accounts if account["chat_id"] == str(chat_id)]
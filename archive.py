@@ -0,0 +1,178 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Every fetched SMS is kept here; the archive is disabled when ARCHIVE_PATH is empty
+ARCHIVE_PATH = os.getenv("ARCHIVE_PATH", "sms_archive.db")
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# 4-8 digit codes, also written as "123-456" or "123 456"
+OTP_RE = re.compile(r"(?<![\d-])(\d{3}[- ]\d{3}|\d{4,8})(?![\d-])")
+SINCE_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*([smhdw])$")
+SINCE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+COLUMNS = ("received_at", "account", "number", "range", "message", "revenue", "otp")
+
+def normalize_number(number):
+    """Return the digits of a phone number ("+1 555-0100" -> "15550100")."""
+    return re.sub(r"\D", "", str(number or ""))
+
+def extract_otp(message):
+    """Return the first code-looking number in a message, or None."""
+    match = OTP_RE.search(message or "")
+    return re.sub(r"\D", "", match.group(1)) if match else None
+
+def parse_since(text, now=None):
+    """Turn "30m", "2h", "1d", "2024-05-01", "2024-05-01 12:00" or an epoch into an epoch."""
+    now = time.time() if now is None else now
+    text = str(text).strip()
+    match = SINCE_RE.match(text.lower())
+    if match:
+        return now - float(match.group(1)) * SINCE_UNITS[match.group(2)]
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        raise ValueError(f"Cannot read a time from {text!r} (try 30m, 2h, 1d or 2024-05-01)")
+
+def _accounts_clause(accounts):
+    """SQL condition and parameters limiting a lookup to accounts (None: every account)."""
+    if accounts is None:
+        return "", []
+    accounts = list(accounts)
+    return f" AND account IN ({', '.join('?' * len(accounts))})", accounts
+
+def _received_at(sms):
+    try:
+        return datetime.strptime(sms["timestamp"], TIMESTAMP_FORMAT).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+
+class SmsArchive:
+    """Append-only SQLite archive of every fetched SMS.
+
+    Rows are indexed by (number, time), (range, time) and time, so the
+    lookups below read a handful of index pages however large the table
+    grows. add_many() writes a whole batch in one transaction; callers on the
+    event loop run it in a thread (see sinks.ArchiveSink).
+    """
+
+    def __init__(self, path=ARCHIVE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS sms ("
+                "id INTEGER PRIMARY KEY, received_at REAL NOT NULL, account TEXT, number TEXT, "
+                "range TEXT, message TEXT, revenue TEXT, otp TEXT)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS sms_number ON sms (number, received_at)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS sms_range ON sms (range, received_at)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS sms_time ON sms (received_at)")
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM sms").fetchone()[0]
+
+    def add_many(self, batch):
+        """Store a batch of SMS records or dicts in one transaction; return the number stored."""
+        rows = [
+            (_received_at(sms), sms.get("account"), normalize_number(sms.get("number") or sms.get("sender")),
+             sms.get("range") or "", sms.get("message") or "", str(sms.get("revenue") or ""),
+             extract_otp(sms.get("message")))
+            for sms in batch
+        ]
+        if not rows:
+            return 0
+        with self._lock, self.conn:
+            self.conn.executemany(
+                f"INSERT INTO sms ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows
+            )
+        return len(rows)
+
+    def add(self, sms):
+        return self.add_many([sms])
+
+    def last_otp(self, number, accounts=None):
+        """Return the newest message with a code sent to number (as a dict), or None.
+
+        Every lookup takes accounts, the account names to search (None: all of them).
+        """
+        clause, params = _accounts_clause(accounts)
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT * FROM sms WHERE number = ? AND otp IS NOT NULL{clause} ORDER BY received_at DESC LIMIT 1",
+                [normalize_number(number), *params]
+            ).fetchone()
+        return dict(row) if row else None
+
+    def messages_for_number(self, number, since=None, limit=20, accounts=None):
+        """Return the newest messages sent to number, newest first."""
+        return self._query("number", normalize_number(number), since, limit, accounts)
+
+    def messages_in_range(self, range_name, since=None, limit=20, accounts=None):
+        """Return the newest messages in a range received at or after since (epoch), newest first."""
+        return self._query("range", range_name, since, limit, accounts)
+
+    def _query(self, column, value, since, limit, accounts):
+        clause, params = _accounts_clause(accounts)
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM sms WHERE {column} = ? AND received_at >= ?{clause} ORDER BY received_at DESC LIMIT ?",
+                [value, since or 0, *params, limit]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+def open_archive(path=ARCHIVE_PATH):
+    """Open the archive, or return None when ARCHIVE_PATH is empty."""
+    return SmsArchive(path) if path else None
+
+def format_archived(row):
+    """One-line summary of an archived SMS for bot replies."""
+    when = datetime.fromtimestamp(row["received_at"]).strftime(TIMESTAMP_FORMAT)
+    return f"{when} +{row['number']} [{row['range']}] {row['message']}"
+
+def otp_reply(archive, args, accounts=None):
+    """Reply text for /otp <number>, searching only accounts (None: all of them)."""
+    if not args:
+        return "Usage: /otp <number>"
+    row = archive.last_otp("".join(args), accounts)
+    if row is None:
+        return f"No code archived for +{normalize_number(''.join(args))}"
+    return f"Last code for +{row['number']}: {row['otp']}\n{format_archived(row)}"
+
+def range_reply(archive, args, limit=10, accounts=None):
+    """Reply text for /range <range> [since], since defaulting to the last 24 hours."""
+    if not args:
+        return "Usage: /range <range> [since, e.g. 30m, 2h, 1d or 2024-05-01]"
+    since_text = "24h"
+    # A bare number at the end is more likely part of the range name than an epoch
+    if len(args) > 1 and not args[-1].replace(".", "").isdigit():
+        try:
+            parse_since(args[-1])
+            since_text, args = args[-1], args[:-1]
+        except ValueError:
+            pass
+    range_name = " ".join(args)
+    rows = archive.messages_in_range(range_name, parse_since(since_text), limit, accounts)
+    if not rows:
+        return f"No messages archived in {range_name} since {since_text}"
+    return f"Latest {len(rows)} message(s) in {range_name} since {since_text}:\n" + "\n".join(
+        format_archived(row) for row in rows)
@@ -0,0 +1,213 @@
+"""End-to-end benchmark of main.py and index.py against the fake ivasms server.
+
+Each target runs against its own in-process bench/fake_ivasms.py server for
+--duration seconds, with a fake Telegram bot that records when every OTP code
+is delivered. Reported per target:
+
+    - OTP latency percentiles (SMS arrival on the server -> Telegram send)
+    - delivered / missed SMS and duplicate sends
+    - server requests per delivered SMS
+    - event loop CPU per poll (the fake server runs on other threads and is
+      not counted)
+
+Poll intervals come from the usual env vars (POLL_MIN_INTERVAL,
+CHECK_MIN_INTERVAL, ...), so the numbers reflect the configuration under
+test. State, dedup and media cache files go to a temporary directory.
+
+    python bench/bench_e2e.py [--target main|index|all] [--duration 60] [--rate 0.5]
+                              [--latency 0.05] [--error-rate 0.01] [--json out.json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import functools
+import contextlib
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ivasms import CODE_RE, add_server_arguments, server_from_args
+
+# index.py exits without credentials; the fake bot never talks to Telegram
+os.environ.setdefault("BOT_TOKEN", "0:bench")
+os.environ.setdefault("CHAT_ID", "1")
+
+class FakeBot:
+    """Stand-in for telegram.Bot that records when each OTP code was sent."""
+
+    def __init__(self):
+        self.delivered = {}
+        self.duplicates = 0
+        self.calls = 0
+
+    def _record(self, text):
+        now = time.time()
+        self.calls += 1
+        for code in CODE_RE.findall(text or ""):
+            if code in self.delivered:
+                self.duplicates += 1
+            else:
+                self.delivered[code] = now
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self._record(text)
+        return SimpleNamespace(photo=[])
+
+    async def send_photo(self, chat_id, photo, caption=None, **kwargs):
+        self._record(caption)
+        return SimpleNamespace(photo=[SimpleNamespace(file_id="bench-file-id")])
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+def report(name, state, server_before, bot, polls, cpu, elapsed):
+    """Summarise one run as a dict."""
+    server_after = state.stats()
+    requests = server_after["total_requests"] - server_before["total_requests"]
+    latencies = [bot.delivered[code] - at for code, at in state.arrivals.items() if code in bot.delivered]
+    delivered = len(latencies)
+    return {
+        "target": name,
+        "seconds": round(elapsed, 1),
+        "arrivals": len(state.arrivals),
+        "delivered": delivered,
+        "missed": len(state.arrivals) - delivered,
+        "duplicates": bot.duplicates,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p90": percentile(latencies, 0.9),
+        "latency_p99": percentile(latencies, 0.99),
+        "latency_max": max(latencies, default=0.0),
+        "polls": polls,
+        "requests": requests,
+        "requests_per_sms": requests / delivered if delivered else None,
+        "cpu_per_poll_ms": 1000 * cpu / polls if polls else None,
+    }
+
+@contextlib.contextmanager
+def quiet(verbose):
+    """Silence the bots' print() output unless --verbose."""
+    if verbose:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+async def run_scheduler(scheduler, duration):
+    try:
+        await asyncio.wait_for(scheduler.run(), duration)
+    except asyncio.TimeoutError:
+        pass
+
+async def bench_main(args):
+    import main
+    from delivery import TelegramDelivery
+    from sinks import build_pipeline
+    from scheduler import PollScheduler
+
+    state, server = server_from_args(args)
+    main.IVASMS_BASE_URL = server.url
+    bot = FakeBot()
+    delivery = TelegramDelivery(bot)
+    delivery.start()
+    sinks = build_pipeline("telegram", delivery=delivery, chat_id="1", formatter=main.format_sms_message)
+    sinks.start()
+    account = {"name": "bench", "email": state.email, "password": state.password, "chat_id": "1"}
+    monitor = main.AccountMonitor(account, sinks)
+    try:
+        with quiet(args.verbose):
+            await monitor.start()
+            scheduler = PollScheduler()
+            scheduler.add(monitor.name, monitor.poll)
+
+            state.resume()
+            before = state.stats()
+            start, cpu = time.time(), time.thread_time()
+            await run_scheduler(scheduler, args.duration)
+            state.pause()
+            cpu = time.thread_time() - cpu
+            elapsed = time.time() - start
+            await sinks.stop()
+            await delivery.stop()
+    finally:
+        await monitor.close()
+        server.shutdown()
+    return report("main", state, before, bot, scheduler.runs[monitor.name], cpu, elapsed)
+
+async def bench_index(args):
+    import index
+    from media_cache import MediaCache
+    from scheduler import PollScheduler
+
+    state, server = server_from_args(args)
+    index.IVASMS_BASE_URL = server.url
+    bot = FakeBot()
+    account = {"name": "bench", "email": state.email, "password": state.password, "chat_id": "1"}
+    ivasms = index.IVASMSBot(account, media=MediaCache("media_cache.json"))
+    try:
+        if not await ivasms.login():
+            raise RuntimeError("index.py could not log in to the fake server")
+        scheduler = PollScheduler(interval=index.CHECK_MAX_INTERVAL)
+        scheduler.add(ivasms.name, functools.partial(ivasms.poll, bot))
+
+        state.resume()
+        before = state.stats()
+        start, cpu = time.time(), time.thread_time()
+        await run_scheduler(scheduler, args.duration)
+        state.pause()
+        cpu = time.thread_time() - cpu
+        elapsed = time.time() - start
+    finally:
+        ivasms.close()
+        server.shutdown()
+    return report("index", state, before, bot, scheduler.runs[ivasms.name], cpu, elapsed)
+
+TARGETS = {"main": bench_main, "index": bench_index}
+
+def print_result(result):
+    def fmt(value, unit=""):
+        return "n/a" if value is None else f"{value:.2f}{unit}"
+    print(f"\n== {result['target']} ({result['seconds']}s)")
+    print(f"  SMS        {result['delivered']}/{result['arrivals']} delivered, "
+          f"{result['missed']} missed, {result['duplicates']} duplicate sends")
+    print(f"  latency    p50 {fmt(result['latency_p50'], 's')}  p90 {fmt(result['latency_p90'], 's')}  "
+          f"p99 {fmt(result['latency_p99'], 's')}  max {fmt(result['latency_max'], 's')}")
+    print(f"  requests   {result['requests']} over {result['polls']} polls, "
+          f"{fmt(result['requests_per_sms'])} per delivered SMS")
+    print(f"  cpu        {fmt(result['cpu_per_poll_ms'], 'ms')} per poll")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=[*TARGETS, "all"], default="main")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to run each target")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the bots' own output")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    output = os.path.abspath(args.json) if args.json else None
+    os.chdir(tempfile.mkdtemp(prefix="ivasms-bench-"))
+    targets = list(TARGETS) if args.target == "all" else [args.target]
+
+    results = []
+    for name in targets:
+        print(f"Running {name} for {args.duration:.0f}s "
+              f"({args.ranges} ranges, {args.rate} SMS/s, latency {args.latency}s)...")
+        result = asyncio.run(TARGETS[name](args))
+        print_result(result)
+        results.append(result)
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
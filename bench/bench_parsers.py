@@ -0,0 +1,117 @@
+"""Parity check and benchmark for the parser backends in parsers.py.
+
+Every backend is run over the saved fixtures in bench/fixtures and over
+synthetic large pages. Output is compared against the BeautifulSoup reference
+and the script exits non-zero on any mismatch, then reports parse time and
+peak Python allocations per page for each backend (tracemalloc does not see
+memory allocated inside libxml2 / lexbor).
+
+    python bench/bench_parsers.py [--iterations 50] [--ranges 500] [--numbers 500]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import parsers
+from html_fixtures import render_statistics, render_numbers, render_message, make_ranges, make_numbers
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Fixture filename prefix -> parser method
+KINDS = {
+    "getsms": "parse_statistics",
+    "number": "parse_numbers",
+    "sms": "parse_message",
+}
+
+def load_corpus(ranges, numbers):
+    """Return a list of (name, method, html) pages to parse."""
+    corpus = []
+    for filename in sorted(os.listdir(FIXTURE_DIR)):
+        if not filename.endswith(".html"):
+            continue
+        kind = filename.split("_")[0].split(".")[0]
+        with open(os.path.join(FIXTURE_DIR, filename), encoding="utf-8") as f:
+            corpus.append((filename, KINDS[kind], f.read()))
+
+    corpus.append((f"synthetic getsms x{ranges}", "parse_statistics", render_statistics(make_ranges(ranges))))
+    corpus.append((f"synthetic number x{numbers}", "parse_numbers", render_numbers(make_numbers(numbers))))
+    corpus.append(("synthetic sms", "parse_message", render_message("Your code is 123456", "0.02")))
+    return corpus
+
+def available_backends():
+    """Instantiate every backend that can be imported here."""
+    backends = []
+    for name, cls in parsers.BACKENDS.items():
+        try:
+            backends.append(cls())
+        except ImportError as e:
+            print(f"skip {name}: {e}")
+    return backends
+
+def check_parity(corpus, backends, reference):
+    """Compare every backend against the reference backend, return mismatch count."""
+    failures = 0
+    for name, method, page in corpus:
+        expected = getattr(reference, method)(page)
+        for backend in backends:
+            got = getattr(backend, method)(page)
+            if got != expected:
+                failures += 1
+                print(f"MISMATCH {backend.name} on {name}:\n  expected {expected!r}\n  got      {got!r}")
+    return failures
+
+def measure(backend, method, page, iterations):
+    """Return (median seconds, peak bytes) for parsing page with backend."""
+    func = getattr(backend, method)
+    func(page)  # warm up
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func(page)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--ranges", type=int, default=500)
+    parser.add_argument("--numbers", type=int, default=500)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.ranges, args.numbers)
+    backends = available_backends()
+    reference = next((b for b in backends if b.name == "bs4"), None)
+    if reference is None:
+        print("beautifulsoup4 is required as the parity reference")
+        return 2
+
+    failures = check_parity(corpus, backends, reference)
+    print(f"parity: {len(corpus)} pages x {len(backends)} backends, {failures} mismatches\n")
+
+    print(f"{'page':<28} {'backend':<11} {'median ms':>10} {'peak KiB':>10} {'speedup':>8}")
+    for name, method, page in corpus:
+        base_time = None
+        for backend in backends:
+            elapsed, peak = measure(backend, method, page, args.iterations)
+            if backend is reference:
+                base_time = elapsed
+            speedup = f"{base_time / elapsed:.1f}x" if base_time else "-"
+            print(f"{name[:28]:<28} {backend.name:<11} {elapsed * 1000:>10.3f} {peak / 1024:>10.1f} {speedup:>8}")
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Memory and diff time of the range state: list of dicts vs RangeTable.
+
+The statistics of --ranges synthetic ranges are loaded from JSON (fresh
+strings, as the parsers produce them) and kept as a list of dicts with a
+name index (the old AccountMonitor state) or as a RangeTable. Retained
+memory is measured with tracemalloc. The diff of two polls is then timed
+with --changed ranges grown, with no count changed, and with a new range
+inserted at the top (the row order differs, so counts are matched by
+name).
+
+    python bench/bench_ranges.py [--ranges 10000] [--changed 50] [--iterations 50]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from html_fixtures import make_ranges
+from range_table import RangeTable
+from pipeline import RangeEvent, diff_ranges
+
+def diff_dicts(ranges, previous):
+    """The diff as done on range dicts before RangeTable, with the name index _poll built for the next one."""
+    index = {r["range_name"]: r for r in ranges}
+    events = []
+    for range_data in ranges:
+        old = previous.get(range_data["range_name"])
+        if old is None:
+            events.append(RangeEvent(range_data["range_name"], range_data["count"]))
+        elif range_data["count"] > old["count"]:
+            events.append(RangeEvent(range_data["range_name"], range_data["count"], old["count"]))
+    return events, index
+
+def build_dicts(blob):
+    ranges = json.loads(blob)
+    return ranges, {r["range_name"]: r for r in ranges}
+
+def build_table(blob):
+    return RangeTable.from_dicts(json.loads(blob))
+
+def retained(build, blob):
+    """Return (result, bytes still allocated once build(blob) returned)."""
+    tracemalloc.start()
+    result = build(blob)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+def timed(func, iterations):
+    func()  # warm up
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def next_poll(ranges, changed, seed=1):
+    """Copy ranges with changed random counts increased."""
+    rng = random.Random(seed)
+    ranges = [dict(r) for r in ranges]
+    for r in rng.sample(ranges, changed):
+        r["count"] += rng.randint(1, 5)
+        r["unpaid"] = r["count"] - r["paid"]
+    return ranges
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ranges", type=int, default=10000)
+    parser.add_argument("--changed", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    base = make_ranges(args.ranges)
+    grown = next_poll(base, args.changed)
+    inserted = [{**base[0], "range_name": "NEW RANGE", "range_id": "NEW RANGE"}] + grown
+    scenarios = [
+        (f"{args.changed} grown", grown, args.changed),
+        ("none grown", base, 0),
+        ("new range on top", inserted, args.changed + 1),
+    ]
+
+    (old_list, old_index), dict_bytes = retained(build_dicts, json.dumps(base))
+    old_table, table_bytes = retained(build_table, json.dumps(base))
+    print(f"{args.ranges} ranges retained: dicts {dict_bytes / 1024:.0f} KiB, "
+          f"table {table_bytes / 1024:.0f} KiB ({dict_bytes / table_bytes:.1f}x smaller)\n")
+
+    failures = 0
+    print(f"{'diff':<20} {'dicts ms':>10} {'table ms':>10} {'speedup':>8}")
+    for name, data, expected in scenarios:
+        new_list, _ = build_dicts(json.dumps(data))
+        new_table = build_table(json.dumps(data))
+        want, _ = diff_dicts(new_list, old_index)
+        got = diff_ranges(new_table, old_table)
+        if got != want or len(got) != expected:
+            failures += 1
+            print(f"MISMATCH on {name}: {len(want)} events from dicts, {len(got)} from the table")
+        dict_time = timed(lambda: diff_dicts(new_list, old_index), args.iterations)
+        table_time = timed(lambda: diff_ranges(new_table, old_table), args.iterations)
+        print(f"{name:<20} {dict_time * 1000:>10.3f} {table_time * 1000:>10.3f} {dict_time / table_time:>7.1f}x")
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
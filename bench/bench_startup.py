@@ -0,0 +1,99 @@
+"""Cold-start import benchmark for the bot entry points, with a time budget.
+
+Each entry module is imported in a fresh interpreter under -X importtime a
+few times. The median cumulative import time is compared against its budget,
+and the heaviest imports are listed. The script exits non-zero when an entry
+goes over budget or eagerly imports a backend that must stay lazy (browser,
+Telegram, parser and desktop backends are loaded on first use).
+
+    python bench/bench_startup.py [--runs 5] [--top 8] [--budget index=250 --budget main=500]
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry module -> import budget in milliseconds
+BUDGETS_MS = {
+    "index": 250,
+    "main": 500,
+    "health": 150,
+    "api.index": 100,
+}
+
+# Modules that must not be imported by merely importing an entry point
+LAZY_MODULES = (
+    "selenium", "undetected_chromedriver", "telegram", "bs4", "lxml",
+    "selectolax", "playsound", "plyer",
+)
+
+def import_profile(module):
+    """Import module in a fresh interpreter; return {imported module: cumulative microseconds}."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}" if module else "pass"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cum, name = line[len("import time:"):].split("|")
+            cumulative[name.strip()] = max(cumulative.get(name.strip(), 0), int(cum))
+        except ValueError:
+            continue
+    return cumulative
+
+def measure(module, runs):
+    """Return (median import ms, profile of the median run)."""
+    samples = []
+    for _ in range(runs):
+        profile = import_profile(module)
+        samples.append((profile.get(module, 0) / 1000, profile))
+    samples.sort(key=lambda s: s[0])
+    return samples[len(samples) // 2]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="heaviest imports to list per entry")
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=MS",
+                        help="override a budget (repeatable)")
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS_MS)
+    for override in args.budget:
+        module, _, ms = override.partition("=")
+        budgets[module] = float(ms)
+
+    # Imported by the interpreter itself (site, .pth hooks), not by the entry point
+    baseline = set(import_profile(None))
+
+    failures = []
+    for module, budget in budgets.items():
+        took, profile = measure(module, args.runs)
+        profile = {name: us for name, us in profile.items() if name not in baseline}
+        eager = sorted({name.split(".")[0] for name in profile} & set(LAZY_MODULES))
+        status = "ok" if took <= budget else "OVER BUDGET"
+        print(f"{module:<12} {took:8.1f} ms  (budget {budget:.0f} ms)  {status}")
+        heaviest = sorted(((us, name) for name, us in profile.items() if name != module), reverse=True)
+        for us, name in [h for h in heaviest if "." not in h[1]][:args.top]:
+            print(f"    {us / 1000:8.1f} ms  {name}")
+        if took > budget:
+            failures.append(f"{module} took {took:.1f} ms (budget {budget:.0f} ms)")
+        if eager:
+            print(f"    eagerly imports: {', '.join(eager)}")
+            failures.append(f"{module} eagerly imports {', '.join(eager)}")
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nAll entry points within budget")
+
+if __name__ == "__main__":
+    main()
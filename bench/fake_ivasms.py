@@ -0,0 +1,370 @@
+"""Local stand-in for www.ivasms.com used by the end-to-end benchmark.
+
+Serves the endpoints main.py and index.py talk to, with the same HTML shapes
+parsers.py expects (rendered by html_fixtures):
+
+    GET  /login, POST /login, GET /portal
+    GET  /portal/sms/received
+    POST /portal/sms/received/getsms
+    POST /portal/sms/received/getsms/number
+    POST /portal/sms/received/getsms/number/sms
+    GET  /api/sms                       (JSON, used by index.py)
+
+SMS arrive as a Poisson process across the ranges. Every message carries a
+unique code ("Your code is 000042") and its arrival time is recorded, so a
+client can measure arrival -> delivery latency. Latency, 5xx errors, 429s
+with Retry-After and session expiry can be injected.
+
+Run standalone and point the bots at it with IVASMS_BASE_URL:
+
+    python bench/fake_ivasms.py --port 8800 --ranges 20 --rate 0.5
+    IVASMS_BASE_URL=http://127.0.0.1:8800 python main.py
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import secrets
+import argparse
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from html_fixtures import render_statistics, render_numbers, render_message, PAGE_HEAD, PAGE_TAIL
+
+SESSION_COOKIE = "ivas_sms_session"
+CODE_RE = re.compile(r"code is (\d+)")
+MULTIPART_FIELD_RE = re.compile(r'name="([^"]+)"\r\n\r\n([^\r]*)\r\n')
+
+class FakeIvasms:
+    """Account state and SMS arrivals behind the fake server.
+
+    ranges and numbers size the initial account; rate is the total SMS
+    arrivals per second; repeat_rate is the share of arrivals that go to a
+    number already listed in its range instead of a new one.
+    """
+
+    def __init__(self, ranges=20, numbers=10, rate=0.5, repeat_rate=0.0,
+                 email="bench@example.com", password="bench", seed=0):
+        self.rng = random.Random(seed)
+        self.rate = rate
+        self.repeat_rate = repeat_rate
+        self.email = email
+        self.password = password
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.ranges = []
+        self.messages = {}
+        self.arrivals = {}
+        self.requests = {}
+        self.recent = []
+        self._seq = 0
+        self._next_id = 100000
+        self._paused = True
+        self._next_arrival = None
+
+        for i in range(ranges):
+            name = f"COUNTRY {i} RANGE {1000 + i}"
+            entry = {"range_name": name, "range_id": name, "count": 0, "paid": 0,
+                     "unpaid": 0, "revenue": 0.0, "numbers": []}
+            self.ranges.append(entry)
+            for _ in range(numbers):
+                self._add_sms(entry, new_number=True)
+
+    # --- SMS arrivals -------------------------------------------------------
+
+    def _add_sms(self, entry, new_number, at=None):
+        """Add one SMS to entry; at is its arrival time (None for the initial backlog)."""
+        self._seq += 1
+        if new_number or not entry["numbers"]:
+            number = {"number": f"234{self.rng.randint(0, 9999999999):010d}", "number_id": str(self._next_id)}
+            self._next_id += 1
+            entry["numbers"].append(number)
+        else:
+            number = self.rng.choice(entry["numbers"])
+        entry["count"] += 1
+        entry["unpaid"] += 1
+        message = {"message": f"Your code is {self._seq:06d}", "revenue": "0.01", "sender": "Service"}
+        self.messages[(entry["range_name"], number["number"])] = message
+        if at is not None:
+            self.arrivals[f"{self._seq:06d}"] = at
+            self.recent.append({
+                "id": self._seq,
+                "sender": message["sender"],
+                "number": number["number"],
+                "message": message["message"],
+                "range": entry["range_name"],
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(at)),
+            })
+            del self.recent[:-200]
+
+    def resume(self):
+        """Start (or restart) SMS arrivals from now."""
+        with self.lock:
+            self._paused = False
+            self._next_arrival = time.time() + self._gap()
+
+    def pause(self):
+        with self.lock:
+            self._paused = True
+
+    def _gap(self):
+        return self.rng.expovariate(self.rate) if self.rate > 0 else float("inf")
+
+    def advance(self):
+        """Materialise every arrival due by now (called under the lock)."""
+        if self._paused or not self.ranges:
+            return
+        now = time.time()
+        while self._next_arrival <= now:
+            entry = self.rng.choice(self.ranges)
+            self._add_sms(entry, self.rng.random() >= self.repeat_rate, at=self._next_arrival)
+            self._next_arrival += self._gap()
+
+    # --- sessions -----------------------------------------------------------
+
+    def login(self, email, password):
+        if email != self.email or password != self.password:
+            return None
+        sid = secrets.token_hex(16)
+        self.sessions[sid] = {"csrf": secrets.token_hex(20), "created": time.time()}
+        return sid
+
+    def session(self, sid, max_age=None):
+        session = self.sessions.get(sid)
+        if session and max_age and time.time() - session["created"] > max_age:
+            del self.sessions[sid]
+            return None
+        return session
+
+    def count(self, path):
+        self.requests[path] = self.requests.get(path, 0) + 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "total_requests": sum(self.requests.values()),
+                "arrivals": len(self.arrivals),
+                "sessions": len(self.sessions),
+            }
+
+class FakeIvasmsHandler(BaseHTTPRequestHandler):
+    """HTTP front end; the server carries .state and the injection settings."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- plumbing -----------------------------------------------------------
+
+    def _send(self, status, body=b"", content_type="text/html; charset=UTF-8", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _redirect(self, location, headers=None):
+        headers = dict(headers or {})
+        headers["Location"] = location
+        self._send(302, b"", headers=headers)
+
+    def _form(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode("utf-8", "replace") if length else ""
+        if "multipart/form-data" in (self.headers.get("Content-Type") or ""):
+            return dict(MULTIPART_FIELD_RE.findall(raw))
+        return {k: v[-1] for k, v in urllib.parse.parse_qs(raw, keep_blank_values=True).items()}
+
+    def _sid(self):
+        for part in (self.headers.get("Cookie") or "").split(";"):
+            key, _, value = part.strip().partition("=")
+            if key == SESSION_COOKIE:
+                return value
+        return None
+
+    def _inject(self):
+        """Apply injected latency and failures; return True if the request was answered."""
+        server = self.server
+        if server.latency:
+            time.sleep(max(0.0, server.rng.gauss(server.latency, server.latency / 4)))
+        roll = server.rng.random()
+        if roll < server.error_rate:
+            self._send(500, "<h1>Server Error</h1>")
+            return True
+        if roll < server.error_rate + server.throttle_rate:
+            self._send(429, "<h1>Too Many Requests</h1>", headers={"Retry-After": str(server.retry_after)})
+            return True
+        return False
+
+    def _dispatch(self, routes):
+        path = urllib.parse.urlsplit(self.path).path.rstrip("/") or "/"
+        state = self.server.state
+        with state.lock:
+            state.count(path)
+        handler = routes.get(path)
+        if handler is None:
+            self._send(404, "<h1>Not Found</h1>")
+            return
+        if self._inject():
+            return
+        with state.lock:
+            state.advance()
+            handler()
+
+    def do_GET(self):
+        self._dispatch({
+            "/": self._home,
+            "/login": self._login_page,
+            "/portal": self._portal,
+            "/portal/sms/received": self._received,
+            "/api/sms": self._api_sms,
+        })
+
+    def do_POST(self):
+        self.form = self._form()
+        self._dispatch({
+            "/login": self._login,
+            "/portal/sms/received/getsms": self._getsms,
+            "/portal/sms/received/getsms/number": self._number,
+            "/portal/sms/received/getsms/number/sms": self._sms,
+        })
+
+    # --- pages --------------------------------------------------------------
+
+    def _session(self):
+        return self.server.state.session(self._sid(), self.server.session_ttl)
+
+    def _authorized(self, check_token=True):
+        """Return the session for an XHR call, answering 401/419 if there is none."""
+        session = self._session()
+        if session is None:
+            self._send(401, '{"message":"Unauthenticated."}', "application/json")
+            return None
+        if check_token and self.form.get("_token") != session["csrf"]:
+            self._send(419, '{"message":"CSRF token mismatch."}', "application/json")
+            return None
+        return session
+
+    def _home(self):
+        self._send(200, PAGE_HEAD + "<h1>iVAS SMS</h1>" + PAGE_TAIL)
+
+    def _login_page(self):
+        token = secrets.token_hex(20)
+        self._send(200, PAGE_HEAD + f'''<form method="POST" action="/login">
+<input type="hidden" name="_token" value="{token}">
+<input name="email"><input name="password" type="password"><button type="submit">Login</button>
+</form>''' + PAGE_TAIL)
+
+    def _login(self):
+        sid = self.server.state.login(self.form.get("email"), self.form.get("password"))
+        if sid is None:
+            self._redirect("/login")
+            return
+        self._redirect("/portal", {"Set-Cookie": f"{SESSION_COOKIE}={sid}; Path=/; HttpOnly"})
+
+    def _portal(self):
+        if self._session() is None:
+            self._redirect("/login")
+            return
+        self._send(200, PAGE_HEAD + '<h1>Dashboard</h1><a href="/logout">Logout</a>' + PAGE_TAIL)
+
+    def _received(self):
+        session = self._session()
+        if session is None:
+            self._redirect("/login")
+            return
+        head = PAGE_HEAD.replace("<title>", f'<meta name="csrf-token" content="{session["csrf"]}">\n<title>', 1)
+        self._send(200, head + "<h1>Received SMS</h1>" + PAGE_TAIL)
+
+    def _getsms(self):
+        if self._authorized():
+            self._send(200, render_statistics(self.server.state.ranges))
+
+    def _range(self, name):
+        return next((r for r in self.server.state.ranges if r["range_name"] == name), None)
+
+    def _number(self):
+        if self._authorized():
+            entry = self._range(self.form.get("range"))
+            self._send(200, render_numbers(entry["numbers"] if entry else [], "range"))
+
+    def _sms(self):
+        if self._authorized():
+            message = self.server.state.messages.get((self.form.get("Range"), self.form.get("Number")))
+            if message is None:
+                self._send(200, PAGE_HEAD + PAGE_TAIL)
+            else:
+                self._send(200, render_message(message["message"], message["revenue"], message["sender"]))
+
+    def _api_sms(self):
+        if self._session() is None:
+            self._send(401, '{"message":"Unauthenticated."}', "application/json")
+            return
+        self._send(200, json.dumps(self.server.state.recent[-50:]), "application/json")
+
+def start_server(state, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, throttle_rate=0.0,
+                 retry_after=5, session_ttl=None, seed=0):
+    """Serve state on a background thread and return the server (server.url is its base URL)."""
+    server = ThreadingHTTPServer((host, port), FakeIvasmsHandler)
+    server.daemon_threads = True
+    server.state = state
+    server.latency = latency
+    server.error_rate = error_rate
+    server.throttle_rate = throttle_rate
+    server.retry_after = retry_after
+    server.session_ttl = session_ttl
+    server.rng = random.Random(seed)
+    server.url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def add_server_arguments(parser):
+    """Register the fake server's tuning flags on an argparse parser."""
+    parser.add_argument("--ranges", type=int, default=20, help="ranges in the account")
+    parser.add_argument("--numbers", type=int, default=10, help="initial numbers per range")
+    parser.add_argument("--rate", type=float, default=0.5, help="SMS arrivals per second")
+    parser.add_argument("--repeat-rate", type=float, default=0.0, help="share of SMS to already listed numbers")
+    parser.add_argument("--latency", type=float, default=0.0, help="mean injected latency per request (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=5, help="Retry-After sent with injected 429s")
+    parser.add_argument("--session-ttl", type=float, default=None, help="expire sessions after this many seconds")
+    parser.add_argument("--seed", type=int, default=0)
+
+def server_from_args(args, host="127.0.0.1", port=0):
+    state = FakeIvasms(args.ranges, args.numbers, args.rate, args.repeat_rate, seed=args.seed)
+    server = start_server(state, host, port, args.latency, args.error_rate, args.throttle_rate,
+                          args.retry_after, args.session_ttl, args.seed)
+    return state, server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    state, server = server_from_args(args, args.host, args.port)
+    state.resume()
+    print(f"Fake ivasms on {server.url} (login {state.email} / {state.password})")
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps(state.stats()))
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
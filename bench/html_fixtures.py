@@ -0,0 +1,82 @@
+"""Render ivasms-shaped HTML pages for parser benchmarks and local replay."""
+import html
+import random
+
+PAGE_HEAD = '''<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>Received SMS</title></head>
+<body><div class="container-fluid"><div id="ResultCDR">
+'''
+PAGE_TAIL = '''</div></div>
+<script src="/assets/js/app.js"></script>
+</body></html>
+'''
+
+def render_statistics(ranges):
+    """Render the /getsms response for a list of range dicts."""
+    if not ranges:
+        return PAGE_HEAD + '<p id="messageFlash" class="text-center">You do not have any SMS</p>\n' + PAGE_TAIL
+
+    cards = []
+    for r in ranges:
+        cards.append(f'''<div class="card card-body mb-1 pointer" onclick="getDetials('{html.escape(r["range_id"])}')">
+  <div class="row align-items-center">
+    <div class="col-sm-4 col-5 text-truncate">{html.escape(r["range_name"])}</div>
+    <div class="col-sm-2 col-2 text-center"><p class="mb-0 pb-0">{r["count"]}</p></div>
+    <div class="col-sm-2 col-2 text-center"><p class="mb-0 pb-0">{r["paid"]}</p></div>
+    <div class="col-sm-2 col-1 text-center"><p class="mb-0 pb-0">{r["unpaid"]}</p></div>
+    <div class="col-sm-2 col-2 text-center"><p class="mb-0 pb-0"><span class="currency_cdr">{r["revenue"]}</span> USD</p></div>
+  </div>
+</div>
+''')
+    return PAGE_HEAD + "".join(cards) + PAGE_TAIL
+
+def render_numbers(numbers, range_id="range"):
+    """Render the /getsms/number response for a list of number dicts."""
+    rows = []
+    for n in numbers:
+        rows.append(f'''<div class="card card-body border-bottom bg-100 p-2 rounded-0">
+  <div class="row">
+    <div class="col-sm-4 col-6 pointer" onclick="getDetialsNumber{html.escape(range_id)}('{n["number"]}','{n["number_id"]}')">
+      <i class="fa fa-phone"></i> {n["number"]}
+    </div>
+    <div class="col-sm-4 col-6 text-end"><p class="mb-0">1</p></div>
+  </div>
+</div>
+''')
+    return PAGE_HEAD + "".join(rows) + PAGE_TAIL
+
+def render_message(message, revenue="0.0", sender="Service"):
+    """Render the /getsms/number/sms response for a single message."""
+    return PAGE_HEAD + f'''<div class="card card-body bg-100 p-2 rounded-0">
+  <div class="row">
+    <div class="col-12 col-sm-4 text-center text-sm-start"><p class="mb-0">{html.escape(sender)}</p></div>
+    <div class="col-9 col-sm-6 text-center text-sm-start"><p class="mb-0 pb-0">{html.escape(message)}</p></div>
+    <div class="col-3 col-sm-2 text-center text-sm-start"><span class="currency_cdr">{revenue}</span></div>
+  </div>
+</div>
+''' + PAGE_TAIL
+
+def make_ranges(count, seed=0):
+    """Build a deterministic list of range dicts for synthetic pages."""
+    rng = random.Random(seed)
+    ranges = []
+    for i in range(count):
+        sms = rng.randint(0, 500)
+        paid = rng.randint(0, sms)
+        ranges.append({
+            "range_name": f"COUNTRY {i} RANGE {1000 + i}",
+            "range_id": f"COUNTRY {i} RANGE {1000 + i}",
+            "count": sms,
+            "paid": paid,
+            "unpaid": sms - paid,
+            "revenue": round(paid * 0.01, 2)
+        })
+    return ranges
+
+def make_numbers(count, prefix="23480", seed=0):
+    """Build a deterministic list of number dicts for synthetic pages."""
+    rng = random.Random(seed)
+    return [
+        {"number": f"{prefix}{rng.randint(0, 99999999):08d}", "number_id": str(100000 + i)}
+        for i in range(count)
+    ]
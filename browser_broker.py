@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import logging
+import threading
+
+from state_store import write_json_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Browsers kept warm after a login, and how long an idle one lives before it is quit
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", 1))
+BROWSER_IDLE_TIMEOUT = float(os.getenv("BROWSER_IDLE_TIMEOUT", 300))
+# Treat cf_clearance as expired this many seconds early
+CLEARANCE_MARGIN = float(os.getenv("CLEARANCE_MARGIN", 120))
+BROWSER_COOKIE_FILE = os.getenv("BROWSER_COOKIE_FILE", "browser_cookies.json")
+
+CLEARANCE_COOKIE = "cf_clearance"
+CHALLENGE_MARKERS = ("Just a moment", "challenge-platform", "cf-chl", "Attention Required")
+
+def is_challenge(response):
+    """Return True if an HTTP response is a Cloudflare challenge instead of the page."""
+    if response is None:
+        return False
+    if response.headers.get("cf-mitigated") == "challenge":
+        return True
+    if response.status_code in (403, 429, 503) and "cloudflare" in response.headers.get("server", "").lower():
+        text = response.text[:10000]
+        return any(marker in text for marker in CHALLENGE_MARKERS)
+    return False
+
+class BrowserPool:
+    """A small pool of headless browsers that are quit once they sit idle.
+
+    factory() launches a driver. Released drivers stay warm for idle_timeout
+    seconds so a burst of logins (several accounts, a retry) reuses one
+    browser; after that they are quit, so normally no browser is running.
+    """
+
+    def __init__(self, factory, size=BROWSER_POOL_SIZE, idle_timeout=BROWSER_IDLE_TIMEOUT):
+        self.factory = factory
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.launched = 0
+        self._idle = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    @property
+    def running(self):
+        return len(self._idle)
+
+    def acquire(self):
+        """Return a warm driver, launching one if none is idle."""
+        with self._lock:
+            if self._idle:
+                driver, _ = self._idle.pop()
+                return driver
+        driver = self.factory()
+        self.launched += 1
+        return driver
+
+    def release(self, driver, broken=False):
+        """Give a driver back (cookies cleared), or quit it if it is broken or the pool is full."""
+        if not broken:
+            try:
+                driver.delete_all_cookies()
+            except Exception:
+                broken = True
+        with self._lock:
+            if not broken and len(self._idle) < self.size:
+                self._idle.append((driver, time.monotonic()))
+                self._schedule_reap()
+                return
+        self._quit(driver)
+
+    def reap(self):
+        """Quit every driver that has been idle for longer than idle_timeout."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [d for d, at in self._idle if now - at >= self.idle_timeout]
+            self._idle = [(d, at) for d, at in self._idle if now - at < self.idle_timeout]
+            self._timer = None
+            if self._idle:
+                self._schedule_reap()
+        for driver in expired:
+            self._quit(driver)
+        if expired:
+            logger.info(f"[BROWSER] Quit {len(expired)} idle browser(s)")
+
+    def close(self):
+        with self._lock:
+            drivers = [d for d, _ in self._idle]
+            self._idle = []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        for driver in drivers:
+            self._quit(driver)
+
+    def _schedule_reap(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.idle_timeout, self.reap)
+            self._timer.daemon = True
+            self._timer.start()
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"[BROWSER] Failed to quit browser: {e}")
+
+class BrowserSessionBroker:
+    """Move browser-earned cookies into a requests session for one account.
+
+    The browser only runs the Cloudflare/login dance. Its cookies (cf_clearance
+    and the ivasms session) and user agent, which the clearance is bound to,
+    are exported into the HTTP session and saved to cookie_file, so restarts
+    and later re-logins can skip the browser until the clearance expires.
+    """
+
+    def __init__(self, pool=None, cookie_file=BROWSER_COOKIE_FILE):
+        self.pool = pool
+        self.cookie_file = cookie_file
+        self.user_agent = None
+        self.browser_logins = 0
+
+    @property
+    def available(self):
+        return self.pool is not None
+
+    @staticmethod
+    def clearance_expires_at(session):
+        expiries = [c.expires for c in session.cookies if c.name == CLEARANCE_COOKIE and c.expires]
+        return min(expiries) if expiries else None
+
+    def clearance_valid(self, session):
+        """Return True if the session holds a cf_clearance that is not about to expire."""
+        expires_at = self.clearance_expires_at(session)
+        return expires_at is not None and expires_at - CLEARANCE_MARGIN > time.time()
+
+    def restore(self, session):
+        """Load saved cookies into session; return False if there are none or they expired."""
+        try:
+            with open(self.cookie_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"[BROWSER] Ignoring unreadable cookie file {self.cookie_file}: {e}")
+            return False
+
+        now = time.time()
+        cookies = [c for c in saved.get("cookies", []) if not c.get("expires") or c["expires"] > now]
+        if not cookies:
+            return False
+        for c in cookies:
+            session.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"),
+                                expires=c.get("expires"), secure=c.get("secure", False))
+        if any(c["name"] == CLEARANCE_COOKIE for c in cookies) and not self.clearance_valid(session):
+            session.cookies.clear()
+            return False
+        self.user_agent = saved.get("user_agent") or self.user_agent
+        logger.info(f"[BROWSER] Restored {len(cookies)} saved cookie(s)")
+        return True
+
+    def save(self, session):
+        """Persist the session's cookies and user agent."""
+        cookies = [
+            {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+             "expires": c.expires, "secure": bool(c.secure)}
+            for c in session.cookies
+        ]
+        try:
+            write_json_snapshot({"user_agent": self.user_agent, "cookies": cookies}, self.cookie_file)
+        except Exception as e:
+            logger.error(f"[BROWSER] Failed to save cookies: {e}")
+
+    def export(self, driver, session):
+        """Copy the browser's cookies and user agent into session."""
+        for c in driver.get_cookies():
+            session.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"),
+                                expires=c.get("expiry"), secure=c.get("secure", False))
+        try:
+            self.user_agent = driver.execute_script("return navigator.userAgent")
+        except Exception as e:
+            logger.warning(f"[BROWSER] Could not read the browser user agent: {e}")
+        self.save(session)
+        expires_at = self.clearance_expires_at(session)
+        if expires_at:
+            logger.info(f"[BROWSER] cf_clearance handed to HTTP client, valid for {(expires_at - time.time()) / 60:.0f} min")
+
+    def browser_login(self, login, session):
+        """Run login(driver) in a pooled browser and hand its cookies to session."""
+        if self.pool is None:
+            return False
+        try:
+            driver = self.pool.acquire()
+        except Exception as e:
+            logger.error(f"[BROWSER] Failed to launch browser: {e}")
+            return False
+        broken = False
+        try:
+            if not login(driver):
+                return False
+            self.browser_logins += 1
+            self.export(driver, session)
+            return True
+        except Exception as e:
+            broken = True
+            logger.error(f"[BROWSER] Browser login failed: {e}")
+            return False
+        finally:
+            self.pool.release(driver, broken=broken)
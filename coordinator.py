@@ -0,0 +1,356 @@
+import os
+import json
+import math
+import time
+import socket
+import sqlite3
+import asyncio
+import inspect
+import logging
+import threading
+import zlib
+
+import metrics
+from dedup import sms_key, DEDUP_TTL
+
+logger = logging.getLogger(__name__)
+
+# Where replicas coordinate: unset (single node, no coordination), sqlite://coordinator.db
+# (replicas on one host; sqlite:///abs/path.db) or redis://host:6379/0 (any Redis-compatible server)
+COORDINATOR = os.getenv("COORDINATOR", "")
+NODE_ID = os.getenv("NODE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+# A dead node's accounts are taken over at most about this many seconds after its last heartbeat
+LEASE_TTL = float(os.getenv("LEASE_TTL", 10))
+# Stop polling a shard this long before the lease would expire, in case a renewal is late
+LEASE_MARGIN = float(os.getenv("LEASE_MARGIN", 2))
+# Longest wait before retrying a shard whose takeover (e.g. login) failed
+TAKEOVER_RETRY_CAP = float(os.getenv("TAKEOVER_RETRY_CAP", 120))
+# An unconfirmed SMS claim lapses after this many seconds, so a node that dies between claiming
+# and sending does not lose the notification; a sent SMS stays claimed for DEDUP_TTL
+CLAIM_PENDING_TTL = float(os.getenv("CLAIM_PENDING_TTL", 300))
+# Key prefix in a shared Redis
+COORDINATOR_PREFIX = os.getenv("COORDINATOR_PREFIX", "ivasms:")
+
+NODE_PREFIX = "node:"
+SHARD_PREFIX = "shard:"
+CHECKPOINT_PREFIX = "checkpoint:"
+
+class SqliteLeaseBackend:
+    """Leases and delivery claims in a SQLite file shared by the replicas on one host.
+
+    Every operation is one autocommitted statement, so SQLite's file lock
+    makes each acquire or claim atomic across processes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._claims = 0
+        self.conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT, expires_at REAL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS claims (key TEXT PRIMARY KEY, expires_at REAL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS checkpoints (key TEXT PRIMARY KEY, value TEXT)")
+
+    def acquire(self, key, owner, ttl):
+        """Take or renew key for owner; return False if someone else holds an unexpired lease."""
+        now = time.time()
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner=excluded.owner, expires_at=excluded.expires_at "
+                "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+                (key, owner, now + ttl, now)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, key, owner):
+        with self._lock:
+            self.conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def holders(self, prefix):
+        """Return {key: owner} of the unexpired leases whose key starts with prefix."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT key, owner FROM leases WHERE substr(key, 1, ?) = ? AND expires_at >= ?",
+                (len(prefix), prefix, time.time())
+            ).fetchall()
+        return dict(rows)
+
+    def claim(self, key, ttl):
+        """Return True for the first caller to claim key within ttl seconds."""
+        now = time.time()
+        with self._lock:
+            cursor = self.conn.execute(
+                "INSERT INTO claims (key, expires_at) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET expires_at=excluded.expires_at WHERE claims.expires_at < ?",
+                (key, now + ttl, now)
+            )
+            self._claims += 1
+            if self._claims % 1000 == 0:
+                self.conn.execute("DELETE FROM claims WHERE expires_at < ?", (now,))
+            return cursor.rowcount == 1
+
+    def unclaim(self, key):
+        """Drop a claim so the key can be claimed again."""
+        with self._lock:
+            self.conn.execute("DELETE FROM claims WHERE key = ?", (key,))
+
+    def extend(self, key, ttl):
+        """Keep an existing claim for ttl seconds from now."""
+        with self._lock:
+            self.conn.execute("UPDATE claims SET expires_at = ? WHERE key = ?", (time.time() + ttl, key))
+
+    def put(self, key, value):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO checkpoints (key, value) VALUES (?, ?)", (key, value))
+
+    def get(self, key):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM checkpoints WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+class RedisLeaseBackend:
+    """Leases and delivery claims in a Redis-compatible server, using server-side expiry."""
+
+    ACQUIRE = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end "
+        "if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then return 1 end return 0"
+    )
+    RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url, prefix=COORDINATOR_PREFIX):
+        import redis
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._acquire = self.client.register_script(self.ACQUIRE)
+        self._release = self.client.register_script(self.RELEASE)
+
+    def acquire(self, key, owner, ttl):
+        return bool(self._acquire(keys=[self.prefix + key], args=[owner, int(ttl * 1000)]))
+
+    def release(self, key, owner):
+        self._release(keys=[self.prefix + key], args=[owner])
+
+    def holders(self, prefix):
+        keys = list(self.client.scan_iter(match=f"{self.prefix}{prefix}*", count=500))
+        if not keys:
+            return {}
+        owners = self.client.mget(keys)
+        return {key[len(self.prefix):]: owner for key, owner in zip(keys, owners) if owner is not None}
+
+    def claim(self, key, ttl):
+        return bool(self.client.set(self.prefix + key, 1, nx=True, px=int(ttl * 1000)))
+
+    def unclaim(self, key):
+        self.client.delete(self.prefix + key)
+
+    def extend(self, key, ttl):
+        self.client.pexpire(self.prefix + key, int(ttl * 1000))
+
+    def put(self, key, value):
+        self.client.set(self.prefix + key, value)
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def close(self):
+        self.client.close()
+
+def claim_key(account, sms):
+    """Key under which an SMS is claimed: the account plus the SMS's dedup key.
+
+    sms_key() covers the portal's identity for the message, so a repeated
+    identical SMS gets a new claim while the same one fetched by two nodes
+    does not.
+    """
+    return f"sms:{account}:{sms_key(sms).hex()}"
+
+def open_backend(url):
+    """Create the lease backend for a COORDINATOR url."""
+    scheme, _, rest = url.partition("://")
+    if scheme in ("sqlite", "file"):
+        return SqliteLeaseBackend(rest or "coordinator.db")
+    if scheme in ("redis", "rediss", "unix"):
+        return RedisLeaseBackend(url)
+    raise ValueError(f"Unknown coordinator backend: {url}")
+
+class Coordinator:
+    """Share the accounts (shards) among replicas with renewable leases.
+
+    Every heartbeat (a third of LEASE_TTL) a node refreshes its own node
+    lease, renews the shards it holds, gives back shards above its fair
+    share (shards / live nodes) so a joining node gets work, and takes free
+    or expired shards up to that share. A node that dies stops renewing, so
+    its shards are picked up by the others within about LEASE_TTL seconds.
+
+    The poll state of a shard is checkpointed to the backend, so the node
+    taking it over diffs against where the previous owner stopped and picks
+    up the SMS that arrived in between.
+
+    Notifications are deduplicated across nodes with claim(): only the first
+    node to claim an SMS sends it, so a shard handed over mid-poll is not
+    notified twice. A claim first holds for CLAIM_PENDING_TTL; confirm()
+    keeps it for DEDUP_TTL once the notification went out, and release()
+    drops it when the send fails. If a node dies between claiming and
+    sending, the claim lapses and the next poll of the account (on any
+    node) sends the SMS.
+    """
+
+    def __init__(self, backend, shards, node_id=NODE_ID, lease_ttl=LEASE_TTL, margin=LEASE_MARGIN):
+        self.backend = backend
+        self.shards = list(shards)
+        self.node_id = node_id
+        self.lease_ttl = lease_ttl
+        self.heartbeat = lease_ttl / 3
+        self.margin = min(margin, lease_ttl / 3)
+        self.leases = {}
+        self.live_nodes = 1
+        self._task = None
+        # Each node walks the shards from its own offset so they do not all race for the same one
+        offset = zlib.crc32(node_id.encode()) % max(1, len(self.shards))
+        self._order = self.shards[offset:] + self.shards[:offset]
+
+    def owns(self, shard):
+        """Return True while this node holds an unexpired lease on shard."""
+        return self.leases.get(shard, 0) - self.margin > time.monotonic()
+
+    @property
+    def owned(self):
+        return [shard for shard in self.shards if self.owns(shard)]
+
+    def tick(self):
+        """One heartbeat: refresh the node lease, renew, rebalance and take shards (blocking)."""
+        started = time.monotonic()
+        self.backend.acquire(NODE_PREFIX + self.node_id, self.node_id, self.lease_ttl)
+        self.live_nodes = max(1, len(self.backend.holders(NODE_PREFIX)))
+        share = math.ceil(len(self.shards) / self.live_nodes)
+
+        for shard in list(self.leases):
+            if not self.backend.acquire(SHARD_PREFIX + shard, self.node_id, self.lease_ttl):
+                logger.warning(f"[COORD] Lost the lease on {shard}")
+                del self.leases[shard]
+            else:
+                self.leases[shard] = started + self.lease_ttl
+        for shard in list(self.leases)[share:]:
+            self.backend.release(SHARD_PREFIX + shard, self.node_id)
+            del self.leases[shard]
+            logger.info(f"[COORD] Handed {shard} back for rebalancing ({self.live_nodes} nodes)")
+
+        if len(self.leases) < share:
+            taken = self.backend.holders(SHARD_PREFIX)
+            for shard in self._order:
+                if len(self.leases) >= share:
+                    break
+                if shard in self.leases or SHARD_PREFIX + shard in taken:
+                    continue
+                if self.backend.acquire(SHARD_PREFIX + shard, self.node_id, self.lease_ttl):
+                    self.leases[shard] = started + self.lease_ttl
+                    logger.info(f"[COORD] {self.node_id} now polls {shard}")
+        metrics.SHARDS_OWNED.set(len(self.leases), node=self.node_id)
+
+    async def start(self):
+        if self._task is None:
+            await asyncio.to_thread(self.tick)
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"[COORD] Node {self.node_id} holds {len(self.leases)}/{len(self.shards)} account(s)")
+
+    async def stop(self):
+        """Stop heartbeating and release every lease so other nodes take over at once."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self._release_all)
+
+    def _release_all(self):
+        for shard in list(self.leases):
+            self.backend.release(SHARD_PREFIX + shard, self.node_id)
+        self.leases.clear()
+        self.backend.release(NODE_PREFIX + self.node_id, self.node_id)
+        self.backend.close()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            try:
+                await asyncio.to_thread(self.tick)
+            except Exception as e:
+                logger.error(f"[COORD] Heartbeat failed: {e}")
+
+    async def claim(self, account, sms, ttl=CLAIM_PENDING_TTL):
+        """Return True if this node is the one to deliver sms (confirm() once it is sent)."""
+        return await asyncio.to_thread(self.backend.claim, claim_key(account, sms), ttl)
+
+    async def confirm(self, account, sms, ttl=DEDUP_TTL):
+        """Keep the claim on an SMS whose notification went out, so no node sends it again."""
+        await asyncio.to_thread(self.backend.extend, claim_key(account, sms), ttl)
+
+    async def release(self, account, sms):
+        """Give up the claim on an SMS whose notification failed, so a later poll can send it."""
+        await asyncio.to_thread(self.backend.unclaim, claim_key(account, sms))
+
+    async def save_checkpoint(self, shard, data):
+        """Share a shard's poll state (JSON-serializable) with the node that may take it over."""
+        await asyncio.to_thread(self.backend.put, CHECKPOINT_PREFIX + shard, json.dumps(data))
+
+    async def load_checkpoint(self, shard):
+        """Return the last poll state saved for shard by any node, or None."""
+        value = await asyncio.to_thread(self.backend.get, CHECKPOINT_PREFIX + shard)
+        return json.loads(value) if value else None
+
+    def guard(self, shard, job, on_acquired=None):
+        """Wrap a poll job so it only runs while this node holds shard.
+
+        on_acquired() (may be async) runs whenever the shard is (re)gained, so
+        a monitor can reload state or log in. If it raises or returns False
+        the shard is not treated as held: it is tried again after a backoff
+        and stays out of /healthz meanwhile, as it does while the shard is
+        held elsewhere.
+        """
+        held = False
+        failures = 0
+
+        async def run():
+            nonlocal held, failures
+            if not self.owns(shard):
+                if held:
+                    logger.info(f"[COORD] Pausing {shard}, now polled by another node")
+                    held = False
+                metrics.unregister_account(shard)
+                return self.heartbeat
+            if not held:
+                if on_acquired is not None:
+                    try:
+                        result = on_acquired()
+                        if inspect.isawaitable(result):
+                            result = await result
+                    except Exception as e:
+                        logger.error(f"[COORD] Could not take over {shard}: {e}")
+                        result = False
+                    if result is False:
+                        delay = min(TAKEOVER_RETRY_CAP, self.heartbeat * 2 ** failures)
+                        failures += 1
+                        metrics.unregister_account(shard)
+                        logger.error(f"[COORD] {shard} not ready, retrying in {delay:.1f}s")
+                        return delay
+                held = True
+                failures = 0
+                metrics.register_account(shard)
+            return await job()
+
+        return run
+
+def open_coordinator(shards, url=None):
+    """Create the configured coordinator, or None for a single node."""
+    url = COORDINATOR if url is None else url
+    if not url:
+        return None
+    return Coordinator(open_backend(url), shards)
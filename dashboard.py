@@ -0,0 +1,183 @@
+import os
+import sys
+import time
+import heapq
+import shutil
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# live (redrawn in place with ANSI codes), log (plain status lines), off, or auto:
+# live on an ANSI-capable terminal, log otherwise
+DASHBOARD_MODE = os.getenv("DASHBOARD", "auto").lower()
+# Seconds between redraws of the live dashboard
+DASHBOARD_REFRESH = float(os.getenv("DASHBOARD_REFRESH", 1.0))
+# Seconds between status lines in log mode (only written when something changed)
+DASHBOARD_LOG_INTERVAL = float(os.getenv("DASHBOARD_LOG_INTERVAL", 60))
+
+ESC = "\x1b["
+MAX_RANGES_SHOWN = 12
+
+def _enable_ansi():
+    """Turn on ANSI escape handling in the Windows console (a no-op elsewhere)."""
+    if os.name != "nt":
+        return True
+    try:
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.GetStdHandle(-11)
+        mode = ctypes.c_uint32()
+        if kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+            return bool(kernel32.SetConsoleMode(handle, mode.value | 0x0004))
+    except Exception:
+        pass
+    return False
+
+def _ago(ts, now):
+    if not ts:
+        return "never"
+    seconds = now - ts
+    return f"{seconds:.0f}s ago" if seconds < 120 else f"{seconds / 60:.0f}m ago"
+
+class Dashboard:
+    """Status view fed with per-account snapshots published by the poll loop.
+
+    Monitors call publish(name, snapshot) after every poll; the dashboard
+    renders the latest snapshots on its own schedule, so a poll never waits
+    on the terminal. summary() may return one extra line (e.g. the Telegram
+    queue) shown above the accounts.
+    """
+
+    def __init__(self, stream=None, summary=None, refresh=DASHBOARD_REFRESH):
+        self.stream = stream or sys.stdout
+        self.summary = summary
+        self.refresh = refresh
+        self.snapshots = {}
+        self._dirty = False
+        self._task = None
+
+    def publish(self, name, snapshot):
+        self.snapshots[name] = snapshot
+        self._dirty = True
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh)
+            if self._dirty:
+                self._dirty = False
+                try:
+                    self.draw(self.render())
+                except Exception as e:
+                    logger.error(f"[DASHBOARD] Failed to draw: {e}")
+
+    def render(self, now=None):
+        """Return the dashboard as a list of lines."""
+        now = time.time() if now is None else now
+        lines = [f"IVASMS monitor  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))}"]
+        if self.summary is not None:
+            lines.append(self.summary())
+        for name, snap in self.snapshots.items():
+            if snap.get("error"):
+                state = f"ERROR x{snap['failures']}: {snap['error']}"
+            else:
+                state = "ok"
+            lines.append(
+                f"[{name}] {state} | poll {snap.get('poll_seconds', 0):.2f}s, last good {_ago(snap.get('last_success'), now)}"
+                f" | next in {snap.get('next_delay', 0):.1f}s | ~{snap.get('rate', 0) * 3600:.1f} SMS/h"
+            )
+            sms = snap.get("last_sms")
+            if sms is not None:
+                lines.append(f"    last SMS {sms['timestamp']} +{sms['number']} [{sms['range']}] {sms['message']}")
+            ranges = snap.get("ranges")
+            if ranges:
+                # ranges is a RangeTable: pick the busiest rows without building a dict per range
+                top = heapq.nlargest(MAX_RANGES_SHOWN, range(len(ranges)), key=ranges.count.__getitem__)
+                shown = ", ".join(f"{ranges.names[i]}: {ranges.count[i]}" for i in top)
+                more = f" (+{len(ranges) - len(top)} more)" if len(ranges) > len(top) else ""
+                lines.append(f"    {len(ranges)} ranges, {sum(ranges.count)} SMS | {shown}{more}")
+        return lines
+
+    def draw(self, lines):
+        raise NotImplementedError
+
+class LiveDashboard(Dashboard):
+    """Dashboard pinned to the top of the terminal and updated in place.
+
+    The lines below it are an ANSI scroll region, so the regular log output
+    keeps scrolling underneath. Each redraw rewrites only the lines that
+    changed since the last one; nothing is cleared and no process is spawned.
+    """
+
+    def __init__(self, stream=None, summary=None, refresh=DASHBOARD_REFRESH):
+        super().__init__(stream, summary, refresh)
+        self._shown = []
+        self._size = None
+
+    def draw(self, lines):
+        columns, rows = shutil.get_terminal_size()
+        height = min(len(lines), max(1, rows // 2))
+        lines = [line[:columns] for line in lines[:height]]
+        out = []
+        if (columns, rows, height) != self._size:
+            # First draw, resize or a taller dashboard: reserve the top rows and redraw everything
+            if self._size is None:
+                # Push what is on screen into the scrollback instead of erasing it
+                out.append("\n" * rows)
+            out.append(f"{ESC}{height + 1};{rows}r{ESC}{rows};1H")
+            self._size = (columns, rows, height)
+            self._shown = []
+        out.append("\x1b7")
+        for row, line in enumerate(lines):
+            if row >= len(self._shown) or self._shown[row] != line:
+                out.append(f"{ESC}{row + 1};1H{line}{ESC}K")
+        out.append("\x1b8")
+        self._shown = lines
+        self.stream.write("".join(out))
+        self.stream.flush()
+
+    async def stop(self):
+        await super().stop()
+        if self._size is not None:
+            # Give the whole screen back to the log
+            self.stream.write(f"{ESC}r{ESC}{self._size[1]};1H\n")
+            self.stream.flush()
+            self._size = None
+
+class LogDashboard(Dashboard):
+    """Headless mode: write the dashboard as plain lines, at most every DASHBOARD_LOG_INTERVAL seconds."""
+
+    def __init__(self, stream=None, summary=None, refresh=DASHBOARD_LOG_INTERVAL):
+        super().__init__(stream, summary, refresh)
+
+    def draw(self, lines):
+        self.stream.write("\n".join(lines) + "\n")
+        self.stream.flush()
+
+def open_dashboard(mode=None, stream=None, summary=None):
+    """Create the configured dashboard, or None when it is off."""
+    mode = (mode or DASHBOARD_MODE).lower()
+    stream = stream or sys.stdout
+    if mode == "auto":
+        live = stream.isatty() and os.getenv("TERM") != "dumb" and _enable_ansi()
+        mode = "live" if live else "log"
+    if mode == "live":
+        return LiveDashboard(stream, summary)
+    if mode == "log":
+        return LogDashboard(stream, summary)
+    if mode != "off":
+        logger.warning(f"[DASHBOARD] Unknown dashboard mode: {mode}")
+    return None
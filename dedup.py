@@ -0,0 +1,151 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Bounds for the in-memory index; persistence is disabled when DEDUP_PATH is empty
+DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", 50000))
+DEDUP_TTL = float(os.getenv("DEDUP_TTL", 2 * 24 * 3600))
+DEDUP_PATH = os.getenv("DEDUP_PATH", "sms_dedup.db")
+
+# Prune the persistent store at most this often (seconds)
+PRUNE_INTERVAL = 3600
+
+def sms_key(sms):
+    """Return a stable key for an SMS dict: number, sender, message and range plus the portal's identity.
+
+    The identity (the /api/sms id or timestamp, or main.py's message_id)
+    keeps a repeated identical SMS from being dropped as already delivered.
+    """
+    identity = sms.get("id") or sms.get("message_id") or sms.get("timestamp")
+    fields = (sms.get("number"), sms.get("sender"), sms.get("message"), sms.get("range"), identity)
+    raw = "\x1f".join(str(field or "") for field in fields).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+class DedupIndex:
+    """Time- and size-bounded LRU of delivered SMS keys with optional SQLite backing.
+
+    The LRU answers almost every lookup from memory. When a path is given, every
+    key is also written to SQLite so a restart does not re-notify messages that
+    were already delivered; entries older than the TTL are pruned from both.
+
+    The index is locked, so it can be used from a worker thread to keep the
+    SQLite reads and writes off the event loop.
+    """
+
+    def __init__(self, max_entries=DEDUP_MAX_ENTRIES, ttl=DEDUP_TTL, path=DEDUP_PATH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._last_prune = 0.0
+        self._lock = threading.RLock()
+        self.conn = None
+        if path:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS seen (key BLOB PRIMARY KEY, ts REAL)")
+            self.conn.commit()
+            self._warm()
+
+    def _warm(self):
+        """Load the most recent persisted keys into the LRU."""
+        cutoff = time.time() - self.ttl
+        cursor = self.conn.execute(
+            "SELECT key, ts FROM (SELECT key, ts FROM seen WHERE ts >= ? ORDER BY ts DESC LIMIT ?) ORDER BY ts",
+            (cutoff, self.max_entries)
+        )
+        for key, ts in cursor:
+            self._entries[key] = ts
+        logger.info(f"[DEDUP] Loaded {len(self._entries)} delivered message keys")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._contains(key)
+
+    def _contains(self, key):
+        now = time.time()
+        ts = self._entries.get(key)
+        if ts is not None:
+            if now - ts <= self.ttl:
+                self._entries.move_to_end(key)
+                return True
+            del self._entries[key]
+            return False
+        if self.conn is not None:
+            row = self.conn.execute("SELECT ts FROM seen WHERE key = ?", (key,)).fetchone()
+            if row and now - row[0] <= self.ttl:
+                self._remember(key, row[0])
+                return True
+        return False
+
+    def _remember(self, key, ts):
+        self._entries[key] = ts
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def seen(self, sms):
+        """Return True if sms was already delivered."""
+        return sms_key(sms) in self
+
+    def unseen(self, batch):
+        """Return the SMS of batch that were not delivered yet, each once."""
+        new, keys = [], set()
+        with self._lock:
+            for sms in batch:
+                key = sms_key(sms)
+                if key not in keys and not self._contains(key):
+                    keys.add(key)
+                    new.append(sms)
+        return new
+
+    def add(self, sms):
+        """Record sms as delivered (call once its notification went out)."""
+        self.add_key(sms_key(sms))
+
+    def add_key(self, key):
+        self.add_keys([key])
+
+    def add_many(self, batch):
+        """Record a batch of delivered SMS in one transaction."""
+        self.add_keys([sms_key(sms) for sms in batch])
+
+    def add_keys(self, keys):
+        if not keys:
+            return
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                self._remember(key, now)
+            if self.conn is not None:
+                with self.conn:
+                    self.conn.executemany("INSERT OR REPLACE INTO seen (key, ts) VALUES (?, ?)",
+                                          [(key, now) for key in keys])
+                if now - self._last_prune > PRUNE_INTERVAL:
+                    self.prune(now)
+
+    def prune(self, now=None):
+        """Drop entries older than the TTL from memory and the persistent store."""
+        now = now or time.time()
+        cutoff = now - self.ttl
+        with self._lock:
+            for key in [k for k, ts in self._entries.items() if ts < cutoff]:
+                del self._entries[key]
+            if self.conn is not None:
+                with self.conn:
+                    self.conn.execute("DELETE FROM seen WHERE ts < ?", (cutoff,))
+            self._last_prune = now
+
+    def close(self):
+        with self._lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
@@ -0,0 +1,211 @@
+import os
+import time
+import asyncio
+import inspect
+import logging
+from collections import deque
+
+from http_client import RateLimiter
+from metrics import SMS_DELIVERED, TELEGRAM_SEND_SECONDS, TELEGRAM_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows roughly 1 msg/s per chat (20/min in groups) and 30 msg/s overall
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", 1.0))
+TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", 3))
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", 25))
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", 5))
+
+# Up to this many queued texts for the same chat are merged into one message
+COALESCE_MAX = int(os.getenv("TELEGRAM_COALESCE_MAX", 10))
+TELEGRAM_MAX_TEXT = 4096
+COALESCE_SEPARATOR = "\n\n"
+
+class OutboundMessage:
+    """A queued Bot API call."""
+
+    __slots__ = ("method", "kwargs", "enqueued_at", "parts", "on_sent", "on_failed")
+
+    def __init__(self, method, kwargs, on_sent=None, on_failed=None):
+        self.method = method
+        self.kwargs = kwargs
+        self.enqueued_at = time.monotonic()
+        self.parts = 1
+        # Called (and awaited if async) once the message was delivered or could not be
+        self.on_sent = [on_sent] if on_sent is not None else []
+        self.on_failed = [on_failed] if on_failed is not None else []
+
+    @property
+    def chat_id(self):
+        return self.kwargs.get("chat_id")
+
+    def can_merge(self, other):
+        """Return True if other is a plain text message that can be appended to this one."""
+        if self.method != "send_message" or other.method != "send_message":
+            return False
+        mine = {k: v for k, v in self.kwargs.items() if k != "text"}
+        theirs = {k: v for k, v in other.kwargs.items() if k != "text"}
+        length = len(self.kwargs["text"]) + len(COALESCE_SEPARATOR) + len(other.kwargs["text"])
+        return mine == theirs and length <= TELEGRAM_MAX_TEXT
+
+    def merge(self, other):
+        self.kwargs["text"] = self.kwargs["text"] + COALESCE_SEPARATOR + other.kwargs["text"]
+        self.parts += other.parts
+        self.on_sent.extend(other.on_sent)
+        self.on_failed.extend(other.on_failed)
+
+class TelegramDelivery:
+    """Outbound Telegram queue served by one long-lived bot.
+
+    Producers call enqueue() and return immediately; a worker task drains the
+    queue, merges bursts of plain texts for the same chat, applies per-chat and
+    global rate limits and retries 429s after Telegram's retry_after.
+    """
+
+    def __init__(self, bot, chat_rate=TELEGRAM_CHAT_RATE, global_rate=TELEGRAM_GLOBAL_RATE,
+                 max_retries=TELEGRAM_MAX_RETRIES, coalesce_max=COALESCE_MAX):
+        self.bot = bot
+        self.max_retries = max_retries
+        self.coalesce_max = coalesce_max
+        self.queue = asyncio.Queue()
+        self.chat_limiter = RateLimiter(chat_rate, TELEGRAM_CHAT_BURST)
+        self.global_limiter = RateLimiter(global_rate, int(global_rate))
+        self._pending = deque()
+        self._worker = None
+
+        # Metrics
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.coalesced = 0
+        self.latencies = deque(maxlen=500)
+
+    def start(self):
+        """Start the delivery worker on the running loop."""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self, timeout=10):
+        """Drain what is queued (up to timeout seconds), then stop the worker."""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[DELIVERY] Stopping with {self.queue_depth} message(s) undelivered")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    def enqueue(self, method="send_message", on_sent=None, on_failed=None, **kwargs):
+        """Queue a Bot API call such as send_message(chat_id=..., text=...).
+
+        on_sent() runs once the call succeeded, on_failed() if it still fails
+        after the retries.
+        """
+        self.queue.put_nowait(OutboundMessage(method, kwargs, on_sent, on_failed))
+        TELEGRAM_QUEUE_DEPTH.set(self.queue_depth)
+
+    @property
+    def queue_depth(self):
+        return self.queue.qsize() + len(self._pending)
+
+    def stats(self):
+        """Return a snapshot of the delivery metrics."""
+        latencies = sorted(self.latencies)
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+        return {
+            "queue_depth": self.queue_depth,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "latency_p50": pct(0.5),
+            "latency_p95": pct(0.95),
+        }
+
+    async def _next_batch(self):
+        """Take the next message and merge queued texts for the same chat into it."""
+        if self._pending:
+            item = self._pending.popleft()
+        else:
+            item = await self.queue.get()
+
+        # Pull everything already queued so a burst can be merged
+        while not self.queue.empty():
+            self._pending.append(self.queue.get_nowait())
+
+        merged = 0
+        rest = deque()
+        while self._pending and merged < self.coalesce_max:
+            other = self._pending.popleft()
+            if other.chat_id == item.chat_id and item.can_merge(other):
+                item.merge(other)
+                merged += 1
+            else:
+                rest.append(other)
+                # Keep per-chat ordering: stop merging past a message for this chat we could not merge
+                if other.chat_id == item.chat_id:
+                    break
+        rest.extend(self._pending)
+        self._pending = rest
+        self.coalesced += merged
+        return item
+
+    async def _run(self):
+        while True:
+            item = await self._next_batch()
+            try:
+                sent = await self._send(item)
+                await self._run_callbacks(item.on_sent if sent else item.on_failed)
+            finally:
+                for _ in range(item.parts):
+                    self.queue.task_done()
+                TELEGRAM_QUEUE_DEPTH.set(self.queue_depth)
+
+    async def _run_callbacks(self, callbacks):
+        for callback in callbacks:
+            try:
+                result = callback()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"[DELIVERY] Delivery callback raised: {e}")
+
+    async def _send(self, item):
+        # Imported here so importing this module does not load python-telegram-bot
+        from telegram.error import RetryAfter, TimedOut, NetworkError, BadRequest, Forbidden
+        for attempt in range(self.max_retries + 1):
+            await self.global_limiter.acquire("global")
+            await self.chat_limiter.acquire(item.chat_id)
+            start = time.monotonic()
+            try:
+                await getattr(self.bot, item.method)(**item.kwargs)
+                TELEGRAM_SEND_SECONDS.observe(time.monotonic() - start, method=item.method)
+                SMS_DELIVERED.inc(item.parts)
+                self.sent += item.parts
+                self.latencies.append(time.monotonic() - item.enqueued_at)
+                logger.info(f"[DELIVERY] {item.method} ok in {time.monotonic() - start:.2f}s ({item.parts} part(s))")
+                return True
+            except RetryAfter as e:
+                self.retries += 1
+                logger.warning(f"[DELIVERY] Rate limited by Telegram, retrying after {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+            except (BadRequest, Forbidden) as e:
+                # BadRequest subclasses NetworkError but a bad chat_id or markup never succeeds on retry
+                logger.error(f"[DELIVERY] {item.method} rejected by Telegram: {e}")
+                break
+            except (TimedOut, NetworkError) as e:
+                self.retries += 1
+                wait = min(30, 2 ** attempt)
+                logger.warning(f"[DELIVERY] {e.__class__.__name__}: {e}, retrying in {wait}s")
+                await asyncio.sleep(wait)
+            except Exception as e:
+                logger.error(f"[DELIVERY] {item.method} failed: {e}")
+                break
+        self.failed += item.parts
+        return False
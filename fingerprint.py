@@ -0,0 +1,60 @@
+import re
+import hashlib
+
+import metrics
+
+# Tokens that change on every response without the statistics changing
+VOLATILE_PATTERNS = [
+    re.compile(rb'(<meta name="csrf-token" content=")[^"]*'),
+    re.compile(rb'(name="_token" value=")[^"]*'),
+    re.compile(rb'(nonce=")[^"]*'),
+]
+
+def normalize_body(body):
+    """Blank out volatile tokens so identical statistics hash identically."""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    for pattern in VOLATILE_PATTERNS:
+        body = pattern.sub(rb'\1', body)
+    return body
+
+def body_digest(body):
+    """Return a short digest of a normalized response body."""
+    return hashlib.blake2b(normalize_body(body), digest_size=16).digest()
+
+class ChangeDetector:
+    """Remember the last response digest and count unchanged (skipped) polls.
+
+    The counts are also exported per account as ivasms_poll_unchanged_total
+    and ivasms_poll_changed_total.
+    """
+
+    def __init__(self, account=None):
+        self.labels = {"account": account} if account else {}
+        self.last_digest = None
+        self.hits = 0
+        self.misses = 0
+
+    def changed(self, body):
+        """Return True if body differs from the previous call."""
+        digest = body_digest(body)
+        if digest == self.last_digest:
+            self.hits += 1
+            metrics.POLL_UNCHANGED.inc(**self.labels)
+            return False
+        self.last_digest = digest
+        self.misses += 1
+        metrics.POLL_CHANGED.inc(**self.labels)
+        return True
+
+    def reset(self):
+        """Forget the last digest so the next response is always processed."""
+        self.last_digest = None
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self):
+        return f"Unchanged polls skipped: {self.hits}/{self.hits + self.misses} ({self.hit_ratio:.0%})"
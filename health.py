@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import asyncio
+import inspect
+import logging
+from http import HTTPStatus
+
+from metrics import REGISTRY, health
+
+logger = logging.getLogger(__name__)
+
+# Idle keep-alive connections are closed after this many seconds
+HEALTH_KEEPALIVE_TIMEOUT = float(os.getenv("HEALTH_KEEPALIVE_TIMEOUT", 30))
+# A request (line, headers and body) must arrive within this many seconds
+HEALTH_READ_TIMEOUT = float(os.getenv("HEALTH_READ_TIMEOUT", 10))
+# Connections beyond this are answered 503 and closed
+HEALTH_MAX_CONNECTIONS = int(os.getenv("HEALTH_MAX_CONNECTIONS", 512))
+# Rendered /metrics is reused for this long so probe storms do not re-render it
+METRICS_SNAPSHOT_TTL = float(os.getenv("METRICS_SNAPSHOT_TTL", 1.0))
+
+MAX_HEADER_LINES = 100
+MAX_BODY_SIZE = 1024 * 1024
+
+STATUS_PAGE = b'''<!DOCTYPE html>
+<html><head><title>IVASMS Bot</title></head>
+<body><h1>IVASMS Bot is running!</h1><p>Status: OK</p></body></html>'''
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method, target, headers, body):
+        self.method = method
+        self.path, _, self.query = target.partition("?")
+        self.headers = headers
+        self.body = body
+
+class BadRequest(Exception):
+    pass
+
+class HealthServer:
+    """HTTP/1.1 status, health and metrics server on the bot's own event loop.
+
+    Connections are kept alive and every read has a timeout, so a slow or
+    stuck probe only holds its own connection. Handlers read the metrics
+    snapshots and never wait on the monitoring loop's locks. Extra endpoints
+    are added with route(); a handler takes the Request and returns
+    (status, content_type, body), and may be async.
+    """
+
+    def __init__(self, host="0.0.0.0", port=None, max_connections=HEALTH_MAX_CONNECTIONS):
+        self.host = host
+        self.port = int(port or os.environ.get("PORT", 10000))
+        self.max_connections = max_connections
+        self.connections = 0
+        self.requests = 0
+        self.routes = {}
+        self._server = None
+        self._writers = set()
+        self._metrics_cache = (0.0, b"")
+        self.route("/", self._status_page)
+        self.route("/metrics", self._metrics)
+        self.route("/healthz", self._healthz)
+
+    def route(self, path, handler, methods=("GET", "HEAD")):
+        """Serve path with handler(request) for the given methods."""
+        self.routes[path.rstrip("/") or "/"] = (handler, tuple(methods))
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port, limit=64 * 1024)
+        logger.info(f"[HEALTH] Health server listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            # Idle keep-alive connections would otherwise hold wait_closed() open
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    # --- built-in endpoints ----------------------------------------------------
+
+    def _status_page(self, request):
+        return 200, "text/html", STATUS_PAGE
+
+    def _metrics(self, request):
+        rendered_at, body = self._metrics_cache
+        now = time.monotonic()
+        if now - rendered_at > METRICS_SNAPSHOT_TTL:
+            body = REGISTRY.render().encode()
+            self._metrics_cache = (now, body)
+        return 200, "text/plain; version=0.0.4; charset=utf-8", body
+
+    def _healthz(self, request):
+        ok, detail = health()
+        return 200 if ok else 503, "application/json", json.dumps(detail).encode()
+
+    # --- HTTP plumbing -----------------------------------------------------------
+
+    async def _read_request(self, reader):
+        """Read one request; return None when the client closed an idle connection."""
+        line = await asyncio.wait_for(reader.readline(), HEALTH_KEEPALIVE_TIMEOUT)
+        if not line:
+            return None
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise BadRequest("malformed request line")
+        method, target, version = parts
+
+        async def read_rest():
+            headers = {}
+            for _ in range(MAX_HEADER_LINES):
+                header = await reader.readline()
+                if header in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = header.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            else:
+                raise BadRequest("too many headers")
+            length = int(headers.get("content-length") or 0)
+            if length > MAX_BODY_SIZE:
+                raise BadRequest("body too large")
+            body = await reader.readexactly(length) if length else b""
+            return headers, body
+
+        try:
+            headers, body = await asyncio.wait_for(read_rest(), HEALTH_READ_TIMEOUT)
+        except ValueError:
+            raise BadRequest("bad Content-Length")
+        if version == "HTTP/1.0" and headers.get("connection", "").lower() != "keep-alive":
+            headers["connection"] = "close"
+        return Request(method, target, headers, body)
+
+    async def _dispatch(self, request):
+        route = self.routes.get(request.path.rstrip("/") or "/")
+        if route is None:
+            return 404, "text/plain", b"Not Found"
+        handler, methods = route
+        if request.method not in methods:
+            return 405, "text/plain", b"Method Not Allowed"
+        result = handler(request)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def _write(self, writer, status, content_type, body, keep_alive, head=False):
+        reason = HTTPStatus(status).phrase
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n".encode("latin-1") + (b"" if head else body)
+        )
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            if self.connections > self.max_connections:
+                self._write(writer, 503, "text/plain", b"Too many connections", keep_alive=False)
+                await writer.drain()
+                return
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except BadRequest as e:
+                    self._write(writer, 400, "text/plain", str(e).encode(), keep_alive=False)
+                    await writer.drain()
+                    return
+                if request is None:
+                    return
+                self.requests += 1
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                try:
+                    status, content_type, body = await self._dispatch(request)
+                except Exception as e:
+                    logger.error(f"[HEALTH] {request.path} failed: {e}")
+                    status, content_type, body = 500, "text/plain", b"Internal Server Error"
+                self._write(writer, status, content_type, body, keep_alive, head=request.method == "HEAD")
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.connections -= 1
+            self._writers.discard(writer)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
@@ -0,0 +1,145 @@
+import os
+import time
+import asyncio
+import logging
+import httpx
+
+from metrics import REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Pool sizing - one pool is shared by every scrape running in the process
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 20))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE", 10))
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 60))
+
+# Per-endpoint timeouts in seconds (connect is capped separately)
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 10))
+REQUEST_TIMEOUTS = {
+    "login": float(os.getenv("HTTP_LOGIN_TIMEOUT", 20)),
+    "received": float(os.getenv("HTTP_RECEIVED_TIMEOUT", 20)),
+    "getsms": float(os.getenv("HTTP_GETSMS_TIMEOUT", 15)),
+    "number": float(os.getenv("HTTP_NUMBER_TIMEOUT", 15)),
+    "sms": float(os.getenv("HTTP_SMS_TIMEOUT", 10)),
+}
+
+# Per-host throttle applied to every request sent through the pool
+HOST_RATE_LIMIT = float(os.getenv("HOST_RATE_LIMIT", 10))
+HOST_RATE_BURST = int(os.getenv("HOST_RATE_BURST", 10))
+
+class RateLimiter:
+    """Async token bucket keyed by host."""
+    
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._buckets = {}
+        self._locks = {}
+    
+    async def acquire(self, host):
+        """Wait until a request to host is allowed by the bucket."""
+        if self.rate <= 0:
+            return
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            tokens, last = self._buckets.get(host, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                wait = (1 - tokens) / self.rate
+                await asyncio.sleep(wait)
+                now = time.monotonic()
+                tokens = 1
+            self._buckets[host] = (tokens - 1, now)
+
+host_limiter = RateLimiter(HOST_RATE_LIMIT, HOST_RATE_BURST)
+
+async def _throttle(request):
+    """httpx request hook that applies the per-host rate limit."""
+    await host_limiter.acquire(request.url.host)
+
+async def _start_timer(request):
+    """httpx request hook that marks when the request left the rate limiters."""
+    request.extensions["started_at"] = time.perf_counter()
+
+async def _observe_latency(response):
+    """httpx response hook that records time to response headers per endpoint."""
+    started_at = response.request.extensions.get("started_at")
+    if started_at is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started_at, endpoint=response.request.url.path)
+
+def http2_available():
+    """Return True if the h2 package is installed so HTTP/2 can be negotiated."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def request_timeout(endpoint):
+    """Return the httpx timeout to use for a scrape endpoint."""
+    total = REQUEST_TIMEOUTS.get(endpoint, REQUEST_TIMEOUTS["getsms"])
+    return httpx.Timeout(total, connect=min(CONNECT_TIMEOUT, total))
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    """Connection pool shared by every client in the process.
+
+    Each account keeps its own AsyncClient (and so its own cookie jar) on top
+    of this transport; closing a client on re-login leaves the pool open.
+    """
+    
+    def __init__(self):
+        self.http2 = http2_available()
+        limits = httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        )
+        logger.info(f"[HTTP] Creating shared connection pool (http2={self.http2}, max_connections={MAX_CONNECTIONS})")
+        self._transport = httpx.AsyncHTTPTransport(http2=self.http2, limits=limits)
+    
+    async def handle_async_request(self, request):
+        return await self._transport.handle_async_request(request)
+    
+    async def aclose(self):
+        pass
+    
+    async def close_pool(self):
+        """Close the underlying connections (at process shutdown)."""
+        await self._transport.aclose()
+
+_shared_transport = None
+
+def shared_transport():
+    """Return the process-wide SharedTransport, creating it on first use."""
+    global _shared_transport
+    if _shared_transport is None:
+        _shared_transport = SharedTransport()
+    return _shared_transport
+
+# Optional per-account throttle on top of the per-host limit
+ACCOUNT_RATE_LIMIT = float(os.getenv("ACCOUNT_RATE_LIMIT", 0))
+account_limiter = RateLimiter(ACCOUNT_RATE_LIMIT, max(1, int(ACCOUNT_RATE_LIMIT)))
+
+def create_client(headers=None, account=None):
+    """Create a keep-alive async client for www.ivasms.com on the shared pool.
+
+    HTTP/2 is used when the server and the local install support it, otherwise
+    the pool falls back to HTTP/1.1 keep-alive connections. Redirects are
+    followed like requests.Session did so login redirects keep working. Every
+    request goes through the shared per-host rate limiter and, when account is
+    given, the per-account limiter; latency is recorded per endpoint path.
+    """
+    hooks = [_throttle]
+    if account is not None:
+        async def _throttle_account(request):
+            await account_limiter.acquire(account)
+        hooks.append(_throttle_account)
+    hooks.append(_start_timer)
+    return httpx.AsyncClient(
+        transport=shared_transport(),
+        timeout=request_timeout("getsms"),
+        headers=headers,
+        follow_redirects=True,
+        event_hooks={"request": hooks, "response": [_observe_latency]}
+    )
@@ -4,30 +4,30 @@ import json
 import time
 import logging
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
 import os
-from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler
 import asyncio
 import urllib.parse
-import threading
 import random
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import functools
 import sys
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from dedup import DedupIndex, DEDUP_PATH
+from archive import open_archive, otp_reply, range_reply
+from media_cache import MediaCache
+from accounts import load_accounts
+from scheduler import PollScheduler, AdaptiveInterval, parse_retry_after
+from health import HealthServer
+from loop_watchdog import LoopWatchdog
+from coordinator import open_coordinator
+from telegram_updates import start_updates, stop_updates, UPDATE_CONCURRENCY
+from browser_broker import BrowserPool, BrowserSessionBroker, BROWSER_COOKIE_FILE, is_challenge
+import metrics
 
-# Try selenium with undetected-chromedriver for Cloudflare bypass
-HAS_SELENIUM = False
-try:
-    from selenium import webdriver
-    from selenium.webdriver.common.by import By
-    from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
-    from selenium.webdriver.chrome.options import Options
-    import undetected_chromedriver as uc
-    HAS_SELENIUM = True
-    logging.info("[SELENIUM] Selenium with undetected-chromedriver loaded - will use for Cloudflare bypass")
-except ImportError as e:
-    logging.warning(f"[SELENIUM] Selenium not available: {e}")
+# Selenium with undetected-chromedriver for Cloudflare bypass, imported only when a challenge needs the browser
+HAS_SELENIUM = all(importlib.util.find_spec(name) is not None for name in ("selenium", "undetected_chromedriver"))
+if not HAS_SELENIUM:
+    logging.warning("[SELENIUM] Selenium / undetected-chromedriver not installed, Cloudflare challenges cannot be solved")
 
 # Set up logging
 logging.basicConfig(
@@ -39,35 +39,18 @@ logger = logging.getLogger(__name__)
 ADMIN_IDS = [6715937373,6715937373]
 bot_users = set()
 
-class HealthHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html')
-        self.end_headers()
-        response = b'''<!DOCTYPE html>
-<html><head><title>IVASMS Bot</title></head>
-<body><h1>IVASMS Bot is running!</h1><p>Status: OK</p></body></html>'''
-        self.wfile.write(response)
-    
-    def do_HEAD(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html')
-        self.end_headers()
-    
-    def log_message(self, format, *args):
-        pass
-
-def run_health_server():
-    """Run a simple HTTP server for health checks."""
-    port = int(os.environ.get("PORT", 10000))
-    server = HTTPServer(('0.0.0.0', port), HealthHandler)
-    logger.info(f"[HEALTH] Health server listening on 0.0.0.0:{port}")
-    server.serve_forever()
-
 BANNER_URL = "https://files.catbox.moe/koc535.jpg"
+IVASMS_BASE_URL = os.getenv("IVASMS_BASE_URL", "https://www.ivasms.com").rstrip("/")
+
+# Adaptive check interval bounds for the API poller (seconds)
+CHECK_MIN_INTERVAL = float(os.getenv("CHECK_MIN_INTERVAL", 15))
+CHECK_MAX_INTERVAL = float(os.getenv("CHECK_MAX_INTERVAL", 60))
+# Threads for blocking HTTP and browser work, shared by every account
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", 4))
 
 def get_inline_keyboard():
     """Return inline keyboard with channel/group buttons - vertical layout."""
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
     keyboard = [
         [InlineKeyboardButton("𝐍ᴜᴍʙᴇʀ 𝐂ʜᴀɴɴᴇʟ", url="https://t.me/mrafrixtech")],
         [InlineKeyboardButton("𝐎ᴛᴘ 𝐆𝐫𝐨𝐮𝐩", url="https://t.me/afrixotpgc")],
@@ -91,10 +74,10 @@ USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2.1 Safari/605.1.15",
 ]
 
-def get_random_headers():
-    """Return random headers to appear as a real browser."""
+def get_random_headers(user_agent=None):
+    """Return random headers to appear as a real browser (user_agent pins the UA, e.g. for cf_clearance)."""
     return {
-        'User-Agent': random.choice(USER_AGENTS),
+        'User-Agent': user_agent or random.choice(USER_AGENTS),
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
         'Accept-Language': 'en-US,en;q=0.9',
         'Accept-Encoding': 'gzip, deflate, br',
@@ -107,102 +90,95 @@ def get_random_headers():
         'Cache-Control': 'max-age=0',
     }
 
+def launch_chrome():
+    """Start a headless undetected Chrome for the browser pool."""
+    import undetected_chromedriver as uc
+    logger.info("[SELENIUM] Initializing undetected Chrome driver...")
+    options = uc.ChromeOptions()
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-web-resources")
+    options.add_argument("--disable-features=VizDisplayCompositor")
+    options.add_argument("--headless=new")
+    options.add_argument(f"--user-agent={random.choice(USER_AGENTS)}")
+    driver = uc.Chrome(options=options, version_main=None)
+    logger.info("[SELENIUM] Chrome driver initialized successfully")
+    return driver
+
 class IVASMSBot:
-    def __init__(self):
-        self.email = os.getenv("Riyanibneearafat@gmail.com", "")
-        self.password = os.getenv("Arko1627", "")
-        self.bot_token = os.getenv("8560175760:AAGzWPyLnrjbGWcXpi0DfZYQq2DvaFAd9iI", "")
-        self.chat_id = os.getenv("6715937373", "")
+    def __init__(self, account, media=None, browsers=None, archive=None, executor=None, coordinator=None):
+        self.name = account["name"]
+        self.email = account["email"]
+        self.password = account["password"]
+        self.bot_token = os.getenv("BOT_TOKEN", "")
+        self.chat_id = account["chat_id"]
         self.session = requests.Session()
-        self.driver = None
+        # Browser cookies (cf_clearance) are handed to self.session; the browser only runs when they expire
+        cookie_file = BROWSER_COOKIE_FILE if self.name == "default" else f"browser_cookies_{self.name}.json"
+        self.broker = BrowserSessionBroker(browsers, cookie_file)
+        self.challenged = False
         self.consecutive_failures = 0
-        self.last_sms = {}
+        self.retry_after = None
+        self.last_check_ok = False
+        self.interval = AdaptiveInterval(CHECK_MIN_INTERVAL, CHECK_MAX_INTERVAL, jitter=0.25)
+        dedup_path = DEDUP_PATH if self.name == "default" or not DEDUP_PATH else f"sms_dedup_{self.name}.db"
+        self.seen_sms = DedupIndex(path=dedup_path)
+        self.media = media or MediaCache()
+        self.archive = archive
+        # Blocking HTTP and browser work runs here (None: the loop's default executor)
+        self.executor = executor
+        # Shares accounts and SMS deliveries with other replicas (None: single node)
+        self.coordinator = coordinator
+        # All monitored accounts, so commands can report on every one of them
+        self.fleet = [self]
+        metrics.register_account(self.name)
         
         if not all([self.email, self.password, self.bot_token, self.chat_id]):
-            logger.error("[INIT] Missing required environment variables!")
+            logger.error(f"[INIT] Missing required credentials for account {self.name}!")
             sys.exit(1)
     
-    def init_selenium_driver(self):
-        """Initialize Selenium driver with undetected-chromedriver."""
-        if not HAS_SELENIUM:
-            logger.warning("[SELENIUM] Selenium not available, cannot initialize driver")
-            return False
-        
-        try:
-            logger.info("[SELENIUM] Initializing undetected Chrome driver...")
-            options = uc.ChromeOptions()
-            options.add_argument("--no-sandbox")
-            options.add_argument("--disable-dev-shm-usage")
-            options.add_argument("--disable-gpu")
-            options.add_argument("--disable-web-resources")
-            options.add_argument("--disable-features=VizDisplayCompositor")
-            options.add_argument("--headless=new")
-            options.add_argument(f"--user-agent={random.choice(USER_AGENTS)}")
-            
-            self.driver = uc.Chrome(options=options, version_main=None)
-            logger.info("[SELENIUM] Chrome driver initialized successfully")
-            return True
-        except Exception as e:
-            logger.error(f"[SELENIUM] Failed to initialize Chrome driver: {e}")
-            self.driver = None
-            return False
-    
-    def selenium_login(self):
-        """Login using Selenium - bypasses Cloudflare properly."""
-        if not HAS_SELENIUM or not self.driver:
-            logger.warning("[SELENIUM] Selenium not available, falling back to requests")
-            return self.requests_login()
-        
+    def selenium_login(self, driver):
+        """Log in with a pooled browser - passes the Cloudflare challenge, cookies are exported afterwards."""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
         try:
             logger.info("[SELENIUM] Starting login with Selenium...")
             
-            # Visit home page first to warm up
-            logger.info("[SELENIUM] Warming up connection...")
-            self.driver.get("https://www.ivasms.com/")
-            time.sleep(random.uniform(2, 4))
-            
-            # Navigate to login
+            # Navigate to login (the challenge, if any, is solved on the way)
             logger.info("[SELENIUM] Navigating to login page...")
-            self.driver.get("https://www.ivasms.com/login")
-            time.sleep(random.uniform(3, 5))
-            
-            # Wait for page to load
-            WebDriverWait(self.driver, 15).until(
-                EC.presence_of_all_elements_located((By.TAG_NAME, "input"))
-            )
-            
-            logger.info("[SELENIUM] Login page loaded, filling form...")
+            driver.get(f"{IVASMS_BASE_URL}/login")
             
             # Find email field and type slowly (human-like)
-            email_input = WebDriverWait(self.driver, 10).until(
+            email_input = WebDriverWait(driver, 30).until(
                 EC.presence_of_element_located((By.NAME, "email"))
             )
+            logger.info("[SELENIUM] Login page loaded, filling form...")
             for char in self.email:
                 email_input.send_keys(char)
                 time.sleep(random.uniform(0.05, 0.15))
             
-            time.sleep(random.uniform(1, 2))
+            time.sleep(random.uniform(0.5, 1))
             
             # Find password field and type slowly
-            password_input = self.driver.find_element(By.NAME, "password")
+            password_input = driver.find_element(By.NAME, "password")
             for char in self.password:
                 password_input.send_keys(char)
                 time.sleep(random.uniform(0.05, 0.15))
             
-            time.sleep(random.uniform(1, 2))
-            
             # Submit form
             logger.info("[SELENIUM] Submitting login form...")
-            submit_button = self.driver.find_element(By.XPATH, "//button[@type='submit']")
+            submit_button = driver.find_element(By.XPATH, "//button[@type='submit']")
             submit_button.click()
             
-            # Wait for redirect
+            # Wait for the redirect away from /login
             logger.info("[SELENIUM] Waiting for login response...")
-            time.sleep(random.uniform(3, 6))
+            WebDriverWait(driver, 20).until(lambda d: not d.current_url.rstrip("/").endswith("/login"))
             
             # Check if login was successful
-            current_url = self.driver.current_url
-            if "dashboard" in current_url or "home" in current_url:
+            current_url = driver.current_url
+            if any(page in current_url for page in ("dashboard", "home", "portal")):
                 logger.info("[SELENIUM] ✓ Login successful!")
                 self.consecutive_failures = 0
                 return True
@@ -214,7 +190,12 @@ class IVASMSBot:
             logger.error(f"[SELENIUM] Selenium login error: {e}")
             return False
     
-    def requests_login(self):
+    async def blocking(self, fn, *args, **kwargs):
+        """Run a blocking call (HTTP, browser) on the blocking-work executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+    
+    async def requests_login(self):
         """Fallback login using requests with advanced headers."""
         try:
             logger.info("[LOGIN] Starting login with requests...")
@@ -223,17 +204,21 @@ class IVASMSBot:
             logger.info("[LOGIN] Warming up connection...")
             for attempt in range(3):
                 try:
-                    resp = self.session.get("https://www.ivasms.com/", 
-                                          headers=get_random_headers(),
-                                          timeout=15)
+                    resp = await self.blocking(self.session.get, f"{IVASMS_BASE_URL}/",
+                                               headers=get_random_headers(self.broker.user_agent),
+                                               timeout=15)
+                    if is_challenge(resp):
+                        logger.warning("[LOGIN] Cloudflare challenge on the homepage")
+                        self.challenged = True
+                        return False
                     if resp.status_code == 200:
                         logger.info("[LOGIN] Homepage loaded successfully")
                         break
                 except Exception as e:
                     logger.warning(f"[LOGIN] Homepage warmup attempt {attempt+1} failed: {e}")
-                    time.sleep(random.uniform(2, 4))
+                    await asyncio.sleep(random.uniform(2, 4))
             
-            time.sleep(random.uniform(2, 4))
+            await asyncio.sleep(random.uniform(2, 4))
             
             # Login attempt
             for attempt in range(5):
@@ -245,13 +230,20 @@ class IVASMSBot:
                         "password": self.password
                     }
                     
-                    login_response = self.session.post(
-                        "https://www.ivasms.com/login",
-                        data=login_data,
-                        headers=get_random_headers(),
-                        timeout=20,
-                        allow_redirects=True
-                    )
+                    with metrics.REQUEST_SECONDS.time(endpoint="/login"):
+                        login_response = await self.blocking(
+                            self.session.post,
+                            f"{IVASMS_BASE_URL}/login",
+                            data=login_data,
+                            headers=get_random_headers(self.broker.user_agent),
+                            timeout=20,
+                            allow_redirects=True
+                        )
+                    
+                    if is_challenge(login_response):
+                        logger.warning("[LOGIN] Cloudflare challenge on login")
+                        self.challenged = True
+                        return False
                     
                     if login_response.status_code == 200:
                         if "dashboard" in login_response.url or "home" in login_response.url or "Logout" in login_response.text:
@@ -271,7 +263,7 @@ class IVASMSBot:
                 if attempt < 4:
                     wait_time = random.uniform(5, 15) * (attempt + 1)
                     logger.info(f"[LOGIN] Waiting {wait_time:.1f}s before retry...")
-                    time.sleep(wait_time)
+                    await asyncio.sleep(wait_time)
             
             logger.error("[LOGIN] All login attempts failed")
             self.consecutive_failures += 1
@@ -282,16 +274,23 @@ class IVASMSBot:
             self.consecutive_failures += 1
             return False
     
-    def check_sms(self):
+    async def check_sms(self):
         """Check for new SMS messages."""
         try:
             logger.info("[SMS] Fetching SMS messages...")
             
-            response = self.session.get(
-                "https://www.ivasms.com/api/sms",
-                headers=get_random_headers(),
-                timeout=15
-            )
+            with metrics.REQUEST_SECONDS.time(endpoint="/api/sms"):
+                response = await self.blocking(
+                    self.session.get,
+                    f"{IVASMS_BASE_URL}/api/sms",
+                    headers=get_random_headers(self.broker.user_agent),
+                    timeout=15
+                )
+            self.last_check_ok = response.status_code == 200
+            if is_challenge(response):
+                logger.warning("[SMS] Cloudflare challenge - clearance expired")
+                self.challenged = True
+                return []
             
             if response.status_code == 200:
                 try:
@@ -299,11 +298,8 @@ class IVASMSBot:
                     new_messages = []
                     
                     if isinstance(sms_data, list):
-                        for sms in sms_data:
-                            sms_id = sms.get("id", str(random.random()))
-                            if sms_id not in self.last_sms:
-                                new_messages.append(sms)
-                                self.last_sms[sms_id] = True
+                        # Recorded as delivered only once the notification is sent (see poll)
+                        new_messages = await self.blocking(self.seen_sms.unseen, sms_data)
                     
                     if new_messages:
                         logger.info(f"[SMS] Found {len(new_messages)} new message(s)")
@@ -314,12 +310,17 @@ class IVASMSBot:
                 except json.JSONDecodeError:
                     logger.warning("[SMS] Could not parse JSON response")
                     return []
+            elif response.status_code == 429:
+                self.retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                logger.warning(f"[SMS] Rate limited (Retry-After: {self.retry_after})")
+                return []
             else:
                 logger.error(f"[SMS] API error: {response.status_code}")
                 return []
                 
         except Exception as e:
             logger.error(f"[SMS] Error checking SMS: {e}")
+            self.last_check_ok = False
             return []
     
     async def send_telegram_message(self, bot, message_text):
@@ -335,7 +336,7 @@ class IVASMSBot:
             logger.error(f"[TELEGRAM] Error sending message: {e}")
     
     async def send_sms_notification(self, bot, sms):
-        """Send SMS notification to Telegram with banner and buttons."""
+        """Send SMS notification to Telegram with banner and buttons; return True if it was sent."""
         try:
             # Format message
             message = f"""
@@ -348,20 +349,134 @@ class IVASMSBot:
 {get_powered_by_caption()}
 """
             
-            # Send with banner
-            with open("src/notification.mp3", "rb") if os.path.exists("src/notification.mp3") else None as audio:
-                await bot.send_photo(
-                    chat_id=self.chat_id,
-                    photo=BANNER_URL,
+            # Send with banner (uploaded once, then reused by file_id)
+            with metrics.TELEGRAM_SEND_SECONDS.time(method="send_photo"):
+                await self.media.send_photo(
+                    bot,
+                    self.chat_id,
+                    BANNER_URL,
                     caption=message,
                     parse_mode="HTML",
                     reply_markup=get_inline_keyboard()
                 )
+            metrics.SMS_DELIVERED.inc()
             
             logger.info("[NOTIFICATION] SMS notification sent")
+            return True
             
         except Exception as e:
             logger.error(f"[NOTIFICATION] Error sending notification: {e}")
+            return False
+    
+    def session_valid(self):
+        """Return True if the current cookies reach the portal without a login page or challenge."""
+        try:
+            response = self.session.get(
+                f"{IVASMS_BASE_URL}/portal",
+                headers=get_random_headers(self.broker.user_agent),
+                timeout=15
+            )
+        except requests.RequestException as e:
+            logger.warning(f"[LOGIN] Session check failed: {e}")
+            return False
+        if is_challenge(response):
+            self.challenged = True
+            return False
+        return response.ok and not response.url.rstrip("/").endswith("/login")
+    
+    async def login(self):
+        """Log in over HTTP, reusing saved cookies; the browser only runs for a Cloudflare challenge.
+        
+        Every blocking step runs on the executor, so the bot keeps answering commands meanwhile.
+        """
+        self.challenged = False
+        if self.broker.restore(self.session) and await self.blocking(self.session_valid):
+            logger.info(f"[LOGIN] [{self.name}] Saved session cookies still valid, skipping login")
+            return True
+        if not self.challenged and await self.requests_login():
+            await self.blocking(self.broker.save, self.session)
+            return True
+        if self.challenged and self.broker.available:
+            logger.info(f"[LOGIN] [{self.name}] Cloudflare challenge, logging in with the browser")
+            if await self.blocking(self.broker.browser_login, self.selenium_login, self.session):
+                self.challenged = False
+                return True
+        return False
+    
+    async def poll(self, bot):
+        """Check for new SMS once, notify, and return the delay before the next check."""
+        try:
+            sms_messages = await self.check_sms()
+            if self.coordinator is not None:
+                # Another replica may have taken this account over and sent some of these already
+                claimed, skipped = [], []
+                for sms in sms_messages:
+                    if await self.coordinator.claim(self.name, sms):
+                        claimed.append(sms)
+                    else:
+                        skipped.append(sms)
+                if skipped:
+                    await self.blocking(self.seen_sms.add_many, skipped)
+                sms_messages = claimed
+            if self.last_check_ok:
+                self.consecutive_failures = 0
+                metrics.poll_succeeded(self.name)
+            else:
+                self.consecutive_failures += 1
+            result = "ok" if self.last_check_ok else "throttled" if self.retry_after is not None else "error"
+            metrics.POLLS.inc(account=self.name, result=result)
+            metrics.CONSECUTIVE_FAILURES.set(self.consecutive_failures, account=self.name)
+            metrics.SMS_DETECTED.inc(len(sms_messages), account=self.name)
+            
+            # Clearance expired: get a new one (the only time the browser runs)
+            if self.challenged:
+                await self.login()
+            
+            arrivals = {}
+            delivered = []
+            try:
+                for sms in sms_messages:
+                    range_name = sms.get("range", "")
+                    arrivals[range_name] = arrivals.get(range_name, 0) + 1
+                    # A message whose notification failed stays unseen and is sent on a later poll
+                    if await self.send_sms_notification(bot, sms):
+                        delivered.append(sms)
+                        if self.coordinator is not None:
+                            await self.coordinator.confirm(self.name, sms)
+                    elif self.coordinator is not None:
+                        await self.coordinator.release(self.name, sms)
+            finally:
+                # One off-loop write for the poll, even if a send raised
+                if delivered:
+                    await self.blocking(self.seen_sms.add_many, delivered)
+            if delivered and self.archive is not None:
+                await self.blocking(self.archive.add_many, [dict(sms, account=self.name) for sms in delivered])
+            
+            # Adaptive interval: tighten after activity, back off when idle
+            if self.retry_after is not None:
+                wait_time = self.interval.throttled(self.retry_after)
+                self.retry_after = None
+            else:
+                wait_time = self.interval.next(arrivals)
+            metrics.POLL_INTERVAL.set(wait_time, account=self.name)
+            logger.info(f"[MAIN] [{self.name}] Next check in {wait_time:.1f}s...")
+            return wait_time
+            
+        except Exception as e:
+            logger.error(f"[MAIN] [{self.name}] Error in monitoring loop: {e}")
+            self.consecutive_failures += 1
+            metrics.POLLS.inc(account=self.name, result="error")
+            metrics.CONSECUTIVE_FAILURES.set(self.consecutive_failures, account=self.name)
+            
+            if self.consecutive_failures >= 10:
+                logger.error(f"[MAIN] [{self.name}] Too many failures, attempting re-login...")
+                await self.login()
+                self.consecutive_failures = 0
+            
+            return random.uniform(60, 120)
+    
+    def close(self):
+        self.seen_sms.close()
     
     async def handle_command(self, update, context):
         """Handle Telegram commands."""
@@ -374,6 +489,8 @@ class IVASMSBot:
                 "🤖 I monitor your ivasms.com account and notify you about incoming SMS.\n\n"
                 "📝 Commands:\n"
                 "/status - Check bot status\n"
+                "/otp <number> - Last code sent to a number\n"
+                "/range <range> [since] - Recent messages in a range\n"
                 "/help - Show this message\n",
                 reply_markup=get_inline_keyboard()
             )
@@ -383,24 +500,46 @@ class IVASMSBot:
                 "📖 Available Commands:\n\n"
                 "/start - Welcome message\n"
                 "/status - Bot status\n"
+                "/otp <number> - Last code sent to a number\n"
+                "/range <range> [since] - Messages in a range since 30m, 2h, 1d or a date (default 24h)\n"
                 "/help - This message\n",
                 reply_markup=get_inline_keyboard()
             )
         
         elif command == "/status":
-            status = "🟢 Online and monitoring" if not self.consecutive_failures else f"🟡 Issues detected ({self.consecutive_failures} failures)"
+            failures = sum(b.consecutive_failures for b in self.fleet)
+            status = "🟢 Online and monitoring" if not failures else f"🟡 Issues detected ({failures} failures)"
             await update.message.reply_text(
                 f"Bot Status: {status}\n"
-                f"Messages tracked: {len(self.last_sms)}\n\n"
+                f"Accounts: {len(self.fleet)}\n"
+                f"Messages tracked: {sum(len(b.seen_sms) for b in self.fleet)}\n\n"
                 f"{get_powered_by_caption()}",
                 reply_markup=get_inline_keyboard()
             )
         
+        elif command in ("/otp", "/range"):
+            if self.archive is None:
+                await update.message.reply_text("The SMS archive is disabled (ARCHIVE_PATH is empty).")
+                return
+            # Admins search every account, other chats only the accounts notifying them
+            accounts = None
+            if not is_admin(user_id):
+                accounts = [b.name for b in self.fleet if b.chat_id == str(update.effective_chat.id)]
+            if accounts == []:
+                await update.message.reply_text("This chat does not receive any account's SMS.")
+                return
+            reply = otp_reply if command == "/otp" else range_reply
+            await update.message.reply_text(await self.blocking(reply, self.archive, context.args, accounts=accounts))
+        
         elif command == "/stats" and is_admin(user_id):
+            accounts = "\n".join(
+                f"• {b.name}: {len(b.seen_sms)} tracked, {b.consecutive_failures} failures, "
+                f"polling every {b.interval.current:.0f}s"
+                for b in self.fleet
+            )
             await update.message.reply_text(
                 f"📊 Admin Stats:\n"
-                f"Messages tracked: {len(self.last_sms)}\n"
-                f"Consecutive failures: {self.consecutive_failures}\n"
+                f"{accounts}\n"
                 f"Last check: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
                 f"{get_powered_by_caption()}",
                 reply_markup=get_inline_keyboard()
@@ -416,89 +555,117 @@ class IVASMSBot:
         
         elif command == "/restart" and is_admin(user_id):
             await update.message.reply_text("🔄 Restarting bot...")
-            self.consecutive_failures = 0
+            for b in self.fleet:
+                b.consecutive_failures = 0
             logger.info("[ADMIN] Bot restarted by admin")
 
 async def main():
     """Main bot loop."""
     
-    # Start health server in background
-    health_thread = threading.Thread(target=run_health_server, daemon=True)
-    health_thread.start()
+    # Health and metrics server on this event loop, up before the heavy Telegram import
+    health_server = HealthServer()
+    await health_server.start()
+    watchdog = LoopWatchdog()
+    watchdog.start()
+    from telegram.ext import Application, CommandHandler
     
-    # Initialize bot
-    bot = Bot(token=os.getenv("BOT_TOKEN"))
-    application = Application.builder().token(os.getenv("BOT_TOKEN")).build()
+    # Initialize bot (one client shared by every account)
+    application = Application.builder().token(os.getenv("BOT_TOKEN")).concurrent_updates(UPDATE_CONCURRENCY).build()
+    bot = application.bot
     
-    # Initialize IVASMS bot
-    ivasms = IVASMSBot()
+    # Initialize one IVASMS bot per account, sharing the Telegram bot, media cache, browser pool
+    # and the executor that runs their blocking HTTP and browser work
+    media = MediaCache()
+    archive = open_archive()
+    browsers = BrowserPool(launch_chrome) if HAS_SELENIUM else None
+    executor = ThreadPoolExecutor(BLOCKING_WORKERS, thread_name_prefix="ivasms-blocking")
+    accounts = load_accounts()
+    # Replicas share the accounts through leases (COORDINATOR); a single node polls them all
+    coordinator = open_coordinator([account["name"] for account in accounts])
+    fleet = [
+        IVASMSBot(account, media=media, browsers=browsers, archive=archive, executor=executor,
+                  coordinator=coordinator)
+        for account in accounts
+    ]
+    for ivasms in fleet:
+        ivasms.fleet = fleet
+    ivasms = fleet[0]
     
     # Add command handlers
     application.add_handler(CommandHandler("start", ivasms.handle_command))
     application.add_handler(CommandHandler("help", ivasms.handle_command))
     application.add_handler(CommandHandler("status", ivasms.handle_command))
+    application.add_handler(CommandHandler("otp", ivasms.handle_command))
+    application.add_handler(CommandHandler("range", ivasms.handle_command))
     application.add_handler(CommandHandler("stats", ivasms.handle_command))
     application.add_handler(CommandHandler("broadcast", ivasms.handle_command))
     application.add_handler(CommandHandler("restart", ivasms.handle_command))
     
-    # Start application
+    # Start application and answer commands while the accounts log in (webhook on the health port, or polling)
     await application.initialize()
     await application.start()
+    await start_updates(application, health_server)
     
-    # Try Selenium first, fallback to requests
-    if HAS_SELENIUM:
-        if ivasms.init_selenium_driver():
-            login_success = ivasms.selenium_login()
-        else:
-            login_success = ivasms.requests_login()
+    active = []
+    if coordinator:
+        # Each account logs in when this node gets its lease (and is retried while the login fails)
+        await coordinator.start()
+        active = fleet
     else:
-        login_success = ivasms.requests_login()
+        # Log in every account; the blocking steps run on the executor so probes and commands are still answered
+        for account_bot in fleet:
+            if await account_bot.login():
+                active.append(account_bot)
+            else:
+                # Not polled this run, so it must not hold /healthz down
+                metrics.unregister_account(account_bot.name)
+                logger.error(f"[MAIN] Initial login failed for {account_bot.name} - check your credentials")
     
-    if not login_success:
-        logger.error("[MAIN] Initial login failed - check your credentials")
+    if not active:
+        logger.error("[MAIN] No account could log in")
+        for account_bot in fleet:
+            account_bot.close()
+        await stop_updates(application)
         await application.stop()
+        await health_server.stop()
+        await watchdog.stop()
+        executor.shutdown(wait=False, cancel_futures=True)
+        if browsers:
+            browsers.close()
+        if archive is not None:
+            archive.close()
         return
     
-    logger.info("[MAIN] Bot started successfully - monitoring for SMS...")
+    logger.info(f"[MAIN] Bot started successfully - monitoring {len(active)} account(s) for SMS...")
+    
+    # Shared scheduler spreads the accounts' checks across the interval
+    scheduler = PollScheduler(interval=CHECK_MAX_INTERVAL)
+    for account_bot in active:
+        job = functools.partial(account_bot.poll, bot)
+        if coordinator:
+            job = coordinator.guard(account_bot.name, job, on_acquired=account_bot.login)
+        scheduler.add(account_bot.name, job)
     
-    # Main monitoring loop
     try:
-        while True:
-            try:
-                sms_messages = ivasms.check_sms()
-                
-                if sms_messages:
-                    for sms in sms_messages:
-                        await ivasms.send_sms_notification(bot, sms)
-                
-                # Random interval between checks (30-60 seconds)
-                wait_time = random.uniform(30, 60)
-                logger.info(f"[MAIN] Next check in {wait_time:.1f}s...")
-                await asyncio.sleep(wait_time)
-                
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"[MAIN] Error in monitoring loop: {e}")
-                ivasms.consecutive_failures += 1
-                
-                if ivasms.consecutive_failures >= 10:
-                    logger.error("[MAIN] Too many failures, attempting re-login...")
-                    if HAS_SELENIUM and ivasms.driver:
-                        ivasms.selenium_login()
-                    else:
-                        ivasms.requests_login()
-                    ivasms.consecutive_failures = 0
-                
-                await asyncio.sleep(random.uniform(60, 120))
+        await scheduler.run()
     
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
         logger.info("[MAIN] Bot interrupted by user")
     
     finally:
-        if ivasms.driver:
-            ivasms.driver.quit()
+        if coordinator:
+            await coordinator.stop()
+        for account_bot in fleet:
+            account_bot.close()
+        await stop_updates(application)
         await application.stop()
+        await health_server.stop()
+        await watchdog.stop()
+        executor.shutdown(wait=False, cancel_futures=True)
+        if browsers:
+            browsers.close()
+        if archive is not None:
+            archive.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+
+from metrics import LOOP_STALLS, LOOP_STALL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Report the event loop as stalled once a callback has held it this long (seconds, 0 disables)
+STALL_THRESHOLD = float(os.getenv("STALL_THRESHOLD", 0.5))
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _is_project_frame(frame):
+    path = os.path.abspath(frame.filename)
+    return path.startswith(PROJECT_DIR) and "site-packages" not in path
+
+def call_site(frame):
+    """Describe where a thread is stuck: the innermost frame of this project and the innermost frame overall."""
+    stack = traceback.extract_stack(frame)
+    ours = [f for f in stack if _is_project_frame(f)]
+    site = ours[-1] if ours else stack[-1]
+    filename = os.path.relpath(site.filename, PROJECT_DIR) if _is_project_frame(site) else site.filename
+    where = f"{filename}:{site.lineno} in {site.name}"
+    if site is not stack[-1]:
+        inner = stack[-1]
+        where += f" (blocked in {os.path.basename(inner.filename)}:{inner.lineno} {inner.name})"
+    return where
+
+class LoopWatchdog:
+    """Detect event loop stalls from a helper thread and report the blocking call site.
+
+    A task on the loop records a heartbeat every threshold / 4 seconds. The
+    watchdog thread checks it; when the heartbeat is older than threshold it
+    samples the loop thread's stack (a callback is still running), logs the
+    offending call site once per stall, and when the loop catches up logs the
+    total stall time and records it in the stall metrics.
+    """
+
+    def __init__(self, threshold=STALL_THRESHOLD):
+        self.threshold = threshold
+        self.interval = threshold / 4
+        self.stalls = 0
+        self.last_site = None
+        self._beat = time.monotonic()
+        self._task = None
+        self._thread = None
+        self._loop_thread_id = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self.threshold <= 0 or self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        stalled_since = None
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            lag = time.monotonic() - beat - self.interval
+            if lag > self.threshold:
+                if stalled_since != beat:
+                    stalled_since = beat
+                    self._report(lag)
+            elif stalled_since is not None:
+                duration = beat - stalled_since - self.interval
+                LOOP_STALL_SECONDS.observe(duration)
+                logger.warning(f"[WATCHDOG] Event loop recovered after a {duration:.2f}s stall")
+                stalled_since = None
+
+    def _report(self, lag):
+        self.stalls += 1
+        LOOP_STALLS.inc()
+        frame = sys._current_frames().get(self._loop_thread_id)
+        self.last_site = call_site(frame) if frame is not None else "unknown"
+        logger.warning(f"[WATCHDOG] Event loop blocked for {lag:.2f}s at {self.last_site}")
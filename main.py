@@ -1,17 +1,31 @@
-import requests
 import re
-import json
-import time
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 import os
-from telegram import Bot
-from telegram.ext import Application, CommandHandler
+import time
 import asyncio
-from playsound import playsound
-from plyer import notification
+import functools
+import httpx
 import urllib.parse
+from http_client import request_timeout
+from session_manager import SessionManager, SessionExpired, backoff_delay, is_login_redirect
+from parsers import parse_statistics_table, parse_numbers, parse_message
+from fingerprint import ChangeDetector
+from number_cache import NumberListCache
+from state_store import open_state_store
+from delivery import TelegramDelivery
+from sinks import build_pipeline
+from accounts import load_accounts, accounts_for_chat
+from scheduler import PollScheduler, AdaptiveInterval, parse_retry_after
+from health import HealthServer
+from loop_watchdog import LoopWatchdog
+from archive import open_archive, otp_reply, range_reply
+from dashboard import open_dashboard
+from coordinator import open_coordinator
+from telegram_updates import start_updates, stop_updates, webhook_enabled, UPDATE_CONCURRENCY
+from range_table import RangeTable
+from pipeline import SmsRecord, FetchJob, RangeProgress, diff_ranges, buffered, ordered_map
+import metrics
 
 # Load environment variables
 load_dotenv()
@@ -19,10 +33,17 @@ IVASMS_EMAIL = os.getenv("IVASMS_EMAIL")
 IVASMS_PASSWORD = os.getenv("IVASMS_PASSWORD")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 CHAT_ID = os.getenv("CHAT_ID")
+# Point at a local stand-in (bench/fake_ivasms.py) for benchmarks and replay
+IVASMS_BASE_URL = os.getenv("IVASMS_BASE_URL", "https://www.ivasms.com").rstrip("/")
+
+# Serve /healthz and /metrics on this port (disabled when unset)
+METRICS_PORT = os.getenv("METRICS_PORT")
+
+# Maximum number of payload_6 requests in flight at once
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", 8))
 
-# Common headers
+# Common headers (Host and Connection are managed by the pooled client)
 BASE_HEADERS = {
-    "Host": "www.ivasms.com",
     "Cache-Control": "max-age=0",
     "Sec-Ch-Ua": '"Not)A;Brand";v="8", "Chromium";v="138"',
     "Sec-Ch-Ua-Mobile": "?0",
@@ -36,14 +57,12 @@ BASE_HEADERS = {
     "Sec-Fetch-Dest": "document",
     "Accept-Encoding": "gzip, deflate, br",
     "Accept-Language": "en-GB,en;q=0.9",
-    "Priority": "u=0, i",
-    "Connection": "keep-alive"
+    "Priority": "u=0, i"
 }
 
-async def send_to_telegram(sms):
-    """Send SMS details to Telegram group with copiable number."""
-    bot = Bot(token=BOT_TOKEN)
-    message = (
+def format_sms_message(sms):
+    """Format SMS details for the Telegram group with copiable number."""
+    return (
         f"New SMS Received:\n"
         f"Timestamp: {sms['timestamp']}\n"
         f"Number: +{sms['number']}\n"
@@ -51,38 +70,18 @@ async def send_to_telegram(sms):
         f"Range: {sms['range']}\n"
         f"Revenue: {sms['revenue']}"
     )
-    try:
-        await bot.send_message(chat_id=CHAT_ID, text=message)
-        print(f"Sent SMS to Telegram: {sms['message'][:50]}...")
-    except Exception as e:
-        print(f"Failed to send to Telegram: {str(e)}")
 
-def show_notification(number, message):
-    """Show desktop notification using plyer."""
-    try:
-        notification.notify(
-            title=f"New SMS on +{number}",
-            message=message[:100],  # Limit message length for notification
-            app_name="IVASMS Monitor",
-            timeout=10
-        )
-        print(f"Displayed notification for number: +{number}")
-    except Exception as e:
-        print(f"Failed to show notification: {str(e)}")
-
-def play_notification_sound():
-    """Play notification sound."""
-    try:
-        playsound("notification.mp3")
-        print("Played notification sound")
-    except Exception as e:
-        print(f"Failed to play notification sound: {str(e)}")
+def format_delivery_stats(delivery):
+    """One-line summary of the Telegram delivery queue for the dashboard."""
+    stats = delivery.stats()
+    return (f"Telegram queue: {stats['queue_depth']} pending, {stats['sent']} sent, "
+            f"{stats['failed']} failed, p95 latency {stats['latency_p95']:.2f}s")
 
-def payload_1(session):
+async def payload_1(session):
     """Send GET request to /login to retrieve initial tokens."""
-    url = "https://www.ivasms.com/login"
+    url = f"{IVASMS_BASE_URL}/login"
     headers = BASE_HEADERS.copy()
-    response = session.get(url, headers=headers)
+    response = await session.get(url, headers=headers, timeout=request_timeout("login"))
     response.raise_for_status()
     
     token_match = re.search(r'<input type="hidden" name="_token" value="([^"]+)"', response.text)
@@ -90,41 +89,41 @@ def payload_1(session):
         raise ValueError("Could not find _token in response")
     return {"_token": token_match.group(1)}
 
-def payload_2(session, _token):
+async def payload_2(session, _token, email=None, password=None):
     """Send POST request to /login with credentials."""
-    url = "https://www.ivasms.com/login"
+    url = f"{IVASMS_BASE_URL}/login"
     headers = BASE_HEADERS.copy()
     headers.update({
         "Content-Type": "application/x-www-form-urlencoded",
         "Sec-Fetch-Site": "same-origin",
-        "Referer": "https://www.ivasms.com/login"
+        "Referer": f"{IVASMS_BASE_URL}/login"
     })
     
     data = {
         "_token": _token,
-        "email": IVASMS_EMAIL,
-        "password": IVASMS_PASSWORD,
+        "email": email or IVASMS_EMAIL,
+        "password": password or IVASMS_PASSWORD,
         "remember": "on",
         "g-recaptcha-response": "",
         "submit": "register"
     }
     
-    response = session.post(url, headers=headers, data=data)
+    response = await session.post(url, headers=headers, data=data, timeout=request_timeout("login"))
     response.raise_for_status()
-    if response.url.endswith("/login"):
+    if str(response.url).endswith("/login"):
         raise ValueError("Login failed, redirected back to /login")
     return response
 
-def payload_3(session):
+async def payload_3(session):
     """Send GET request to /sms/received to get statistics page."""
-    url = "https://www.ivasms.com/portal/sms/received"
+    url = f"{IVASMS_BASE_URL}/portal/sms/received"
     headers = BASE_HEADERS.copy()
     headers.update({
         "Sec-Fetch-Site": "same-origin",
-        "Referer": "https://www.ivasms.com/portal"
+        "Referer": f"{IVASMS_BASE_URL}/portal"
     })
     
-    response = session.get(url, headers=headers)
+    response = await session.get(url, headers=headers, timeout=request_timeout("received"))
     response.raise_for_status()
     
     # Extract CSRF token from response
@@ -133,9 +132,9 @@ def payload_3(session):
         raise ValueError("Could not find CSRF token in /sms/received response")
     return response, token_match.group(1)
 
-def payload_4(session, csrf_token, from_date, to_date):
+async def payload_4(session, csrf_token, from_date, to_date):
     """Send POST request to /sms/received/getsms to fetch SMS statistics."""
-    url = "https://www.ivasms.com/portal/sms/received/getsms"
+    url = f"{IVASMS_BASE_URL}/portal/sms/received/getsms"
     headers = BASE_HEADERS.copy()
     headers.update({
         "Content-Type": "multipart/form-data; boundary=----WebKitFormBoundaryhkp0qMozYkZV6Ham",
@@ -143,8 +142,8 @@ def payload_4(session, csrf_token, from_date, to_date):
         "Sec-Fetch-Site": "same-origin",
         "Sec-Fetch-Mode": "cors",
         "Sec-Fetch-Dest": "empty",
-        "Referer": "https://www.ivasms.com/portal/sms/received",
-        "Origin": "https://www.ivasms.com"
+        "Referer": f"{IVASMS_BASE_URL}/portal/sms/received",
+        "Origin": IVASMS_BASE_URL
     })
     
     data = (
@@ -163,80 +162,30 @@ def payload_4(session, csrf_token, from_date, to_date):
         "------WebKitFormBoundaryhkp0qMozYkZV6Ham--\r\n"
     )
     
-    response = session.post(url, headers=headers, data=data)
+    response = await session.post(url, headers=headers, content=data, timeout=request_timeout("getsms"))
     response.raise_for_status()
     return response
 
-def parse_statistics(response_text):
-    """Parse SMS statistics from response and return range data."""
-    soup = BeautifulSoup(response_text, 'html.parser')
-    ranges = []
-    
-    # Check for "no SMS" message
-    no_sms = soup.find('p', id='messageFlash')
-    if no_sms and "You do not have any SMS" in no_sms.text:
-        return ranges
-    
-    # Find all range cards
-    range_cards = soup.find_all('div', class_='card card-body mb-1 pointer')
-    for card in range_cards:
-        cols = card.find_all('div', class_=re.compile(r'col-sm-\d+|col-\d+'))
-        if len(cols) >= 5:
-            range_name = cols[0].text.strip()
-            count_text = cols[1].find('p').text.strip()
-            paid_text = cols[2].find('p').text.strip()
-            unpaid_text = cols[3].find('p').text.strip()
-            revenue_span = cols[4].find('span', class_='currency_cdr')
-            revenue_text = revenue_span.text.strip() if revenue_span else "0.0"
-            
-            # Convert to appropriate types, with fallback to 0
-            try:
-                count = int(count_text) if count_text else 0
-                paid = int(paid_text) if paid_text else 0
-                unpaid = int(unpaid_text) if unpaid_text else 0
-                revenue = float(revenue_text) if revenue_text else 0.0
-            except ValueError as e:
-                count, paid, unpaid, revenue = 0, 0, 0, 0.0
-            
-            # Extract range_id from onclick
-            onclick = card.get('onclick', '')
-            range_id_match = re.search(r"getDetials\('([^']+)'\)", onclick)
-            range_id = range_id_match.group(1) if range_id_match else range_name
-            
-            ranges.append({
-                "range_name": range_name,
-                "range_id": range_id,
-                "count": count,
-                "paid": paid,
-                "unpaid": unpaid,
-                "revenue": revenue
-            })
-    
-    return ranges
-
-def save_to_json(data, filename="sms_statistics.json"):
-    """Save range data to JSON file."""
+def save_state(store, data):
+    """Persist range data, writing only the ranges that changed."""
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4)
-        print("Range saved in file")
+        changed = store.save(data)
+        if changed:
+            print(f"Range saved in store ({changed} changed)")
     except Exception as e:
-        print(f"Failed to save to JSON: {str(e)}")
+        print(f"Failed to save state: {str(e)}")
 
-def load_from_json(filename="sms_statistics.json"):
-    """Load range data from JSON file."""
+def load_state(store):
+    """Load range data from the state store."""
     try:
-        if os.path.exists(filename):
-            with open(filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
+        return store.load()
     except Exception as e:
-        print(f"Failed to load from JSON: {str(e)}")
+        print(f"Failed to load state: {str(e)}")
         return []
 
-def payload_5(session, csrf_token, to_date, range_name):
+async def payload_5(session, csrf_token, to_date, range_name):
     """Send POST request to /sms/received/getsms/number to get numbers for a range."""
-    url = "https://www.ivasms.com/portal/sms/received/getsms/number"
+    url = f"{IVASMS_BASE_URL}/portal/sms/received/getsms/number"
     headers = BASE_HEADERS.copy()
     headers.update({
         "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
@@ -244,8 +193,8 @@ def payload_5(session, csrf_token, to_date, range_name):
         "Sec-Fetch-Site": "same-origin",
         "Sec-Fetch-Mode": "cors",
         "Sec-Fetch-Dest": "empty",
-        "Referer": "https://www.ivasms.com/portal/sms/received",
-        "Origin": "https://www.ivasms.com"
+        "Referer": f"{IVASMS_BASE_URL}/portal/sms/received",
+        "Origin": IVASMS_BASE_URL
     })
     
     data = {
@@ -255,28 +204,13 @@ def payload_5(session, csrf_token, to_date, range_name):
         "range": range_name
     }
     
-    response = session.post(url, headers=headers, data=data)
+    response = await session.post(url, headers=headers, data=data, timeout=request_timeout("number"))
     response.raise_for_status()
     return response
 
-def parse_numbers(response_text):
-    """Parse numbers from the range response."""
-    soup = BeautifulSoup(response_text, 'html.parser')
-    numbers = []
-    
-    number_divs = soup.find_all('div', class_='card card-body border-bottom bg-100 p-2 rounded-0')
-    for div in number_divs:
-        onclick = div.find('div', class_=re.compile(r'col-sm-\d+|col-\d+')).get('onclick', '')
-        match = re.search(r"'([^']+)','([^']+)'", onclick)
-        if match:
-            number, number_id = match.groups()
-            numbers.append({"number": number, "number_id": number_id})
-    
-    return numbers
-
-def payload_6(session, csrf_token, to_date, number, range_name):
+async def payload_6(session, csrf_token, to_date, number, range_name):
     """Send POST request to /sms/received/getsms/number/sms to get message details."""
-    url = "https://www.ivasms.com/portal/sms/received/getsms/number/sms"
+    url = f"{IVASMS_BASE_URL}/portal/sms/received/getsms/number/sms"
     headers = BASE_HEADERS.copy()
     headers.update({
         "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
@@ -284,8 +218,8 @@ def payload_6(session, csrf_token, to_date, number, range_name):
         "Sec-Fetch-Site": "same-origin",
         "Sec-Fetch-Mode": "cors",
         "Sec-Fetch-Dest": "empty",
-        "Referer": "https://www.ivasms.com/portal/sms/received",
-        "Origin": "https://www.ivasms.com"
+        "Referer": f"{IVASMS_BASE_URL}/portal/sms/received",
+        "Origin": IVASMS_BASE_URL
     })
     
     data = {
@@ -296,158 +230,336 @@ def payload_6(session, csrf_token, to_date, number, range_name):
         "Range": range_name
     }
     
-    response = session.post(url, headers=headers, data=data)
+    response = await session.post(url, headers=headers, data=data, timeout=request_timeout("sms"))
     response.raise_for_status()
     return response
 
-def parse_message(response_text):
-    """Parse message details from response."""
-    soup = BeautifulSoup(response_text, 'html.parser')
-    message_div = soup.find('div', class_='col-9 col-sm-6 text-center text-sm-start')
-    revenue_div = soup.find('div', class_='col-3 col-sm-2 text-center text-sm-start')
-    
-    message = message_div.find('p').text.strip() if message_div else "No message found"
-    revenue = revenue_div.find('span', class_='currency_cdr').text.strip() if revenue_div else "0.0"
-    return {"message": message, "revenue": revenue}
+async def login(session, email=None, password=None):
+    """Log in with payload_1/payload_2 and return the CSRF token from payload_3."""
+    tokens = await payload_1(session)
+    await payload_2(session, tokens["_token"], email, password)
+    response, csrf_token = await payload_3(session)
+    return csrf_token
+
+async def refresh_csrf_token(session):
+    """Fetch a fresh CSRF token for the current session from /portal/sms/received."""
+    try:
+        response, csrf_token = await payload_3(session)
+    except ValueError as e:
+        raise SessionExpired(str(e))
+    if is_login_redirect(response):
+        raise SessionExpired("Redirected to /login while refreshing CSRF token")
+    return csrf_token
+
+class AccountMonitor:
+    """Monitor the SMS statistics of one ivasms account."""
+    
+    def __init__(self, account, sinks, dashboard=None, coordinator=None):
+        self.name = account["name"]
+        self.chat_id = account["chat_id"]
+        self.sinks = sinks
+        self.dashboard = dashboard
+        self.coordinator = coordinator
+        self.session = SessionManager(
+            functools.partial(login, email=account["email"], password=account["password"]),
+            refresh_csrf_token,
+            account=self.name
+        )
+        self.state = open_state_store(path=account.get("state_path"), account=self.name)
+        self.change_detector = ChangeDetector(account=self.name)
+        self.interval = AdaptiveInterval()
+        self.number_cache = NumberListCache()
+        self.existing_ranges = None
+        self.failures = 0
+        self.last_error = None
+        self.last_sms = None
+        metrics.register_account(self.name)
+        
+        # Calculate date range
+        today = datetime.now()
+        self.from_date = today.strftime("%m/%d/%Y")
+        self.to_date = (today + timedelta(days=1)).strftime("%m/%d/%Y")
+    
+    async def start(self):
+        """Log in, load the stored statistics and take the initial snapshot."""
+        await self.session.start()
+        
+        # Fetch initial statistics
+        response = await self.session.call(payload_4, self.from_date, self.to_date)
+        ranges = parse_statistics_table(response.text)
+        
+        # Load existing statistics (the shared checkpoint wins, another node may have polled since)
+        self.existing_ranges = RangeTable.from_dicts(load_state(self.state))
+        if self.coordinator is not None:
+            checkpoint = await self.coordinator.load_checkpoint(self.name)
+            if checkpoint is not None:
+                self.existing_ranges = RangeTable.from_json(checkpoint)
+        
+        # Save initial statistics if the store is empty and use them as the baseline
+        if not self.existing_ranges:
+            await self.save(ranges)
+            self.existing_ranges = ranges
+        
+        # Always diff the first poll against the stored state
+        self.change_detector.reset()
+    
+    def reset(self):
+        """Reload the stored statistics before the next poll (e.g. after another node polled this account)."""
+        self.existing_ranges = None
+        self.number_cache = NumberListCache()
+    
+    async def save(self, ranges):
+        """Persist ranges locally and, with a coordinator, as the account's shared checkpoint."""
+        save_state(self.state, ranges)
+        if self.coordinator is not None:
+            await self.coordinator.save_checkpoint(self.name, ranges.to_columns())
+    
+    async def claim(self, sms):
+        """Return True if this node should notify sms (always, without a coordinator)."""
+        if self.coordinator is None:
+            return True
+        if not await self.coordinator.claim(self.name, sms):
+            return False
+        # Keep the claim once the notification is out; let another poll (on any node) send it if it fails
+        sms.on_sent = functools.partial(self.coordinator.confirm, self.name, sms)
+        sms.on_failed = functools.partial(self.coordinator.release, self.name, sms)
+        return True
+    
+    def publish(self, sms):
+        """Hand a detected SMS to the notification sinks."""
+        print(f"New SMS: {sms.as_dict()}")
+        self.last_sms = sms
+        metrics.SMS_DETECTED.inc(account=self.name)
+        self.sinks.publish(sms)
+    
+    async def fetch_jobs(self, events, progress):
+        """Pipeline stage: fetch the number list of each changed range and yield its new numbers, latest first."""
+        for event in events:
+            response = await self.session.call(payload_5, self.to_date, event.range_name)
+            numbers = parse_numbers(response.text)
+            new = self.number_cache.new_numbers(event.range_name, numbers, event.expected) if numbers else []
+            progress.expect(event.range_name, len(new))
+            for number_data in reversed(new):
+                yield FetchJob(event.range_name, number_data["number"], number_data["number_id"])
+    
+    async def fetch_record(self, job):
+        """Pipeline stage: fetch the latest message of one number."""
+        print(f"Fetching message for number: {job.number}")
+        response = await self.session.call(payload_6, self.to_date, job.number, job.range_name)
+        message_data = parse_message(response.text)
+        return SmsRecord(
+            timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            number=job.number,
+            message=message_data["message"],
+            range=job.range_name,
+            revenue=message_data["revenue"],
+            account=self.name,
+            chat_id=self.chat_id,
+            message_id=job.number_id
+        )
+    
+    async def poll(self):
+        """Run one poll, publish its outcome to the dashboard and return the delay before the next one."""
+        started = time.perf_counter()
+        delay = await self._run()
+        if self.dashboard is not None:
+            self.dashboard.publish(self.name, self.snapshot(time.perf_counter() - started, delay))
+        return delay
+    
+    def snapshot(self, poll_seconds, delay):
+        """Return this account's status for the dashboard."""
+        return {
+            "ranges": self.existing_ranges,
+            "last_sms": self.last_sms,
+            "poll_seconds": poll_seconds,
+            "next_delay": delay,
+            "failures": self.failures,
+            "error": self.last_error,
+            "last_success": metrics.last_success.get(self.name),
+            "rate": self.interval.stats()["total_rate"],
+        }
+    
+    async def _run(self):
+        try:
+            if self.existing_ranges is None:
+                await self.start()
+            delay = await self._poll()
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 429:
+                return self._failed(e)
+            metrics.POLLS.inc(account=self.name, result="throttled")
+            # A number or message fetch may have been cut short: diff the next page even if it is unchanged
+            self.change_detector.reset()
+            delay = self.interval.throttled(parse_retry_after(e.response.headers.get("Retry-After")))
+            metrics.POLL_INTERVAL.set(delay, account=self.name)
+            self.last_error = "rate limited"
+            print(f"[{self.name}] Rate limited by ivasms, next poll in {delay:.1f} seconds")
+            return delay
+        except Exception as e:
+            return self._failed(e)
+        metrics.POLLS.inc(account=self.name, result="ok")
+        metrics.POLL_INTERVAL.set(delay, account=self.name)
+        metrics.poll_succeeded(self.name)
+        return delay
+    
+    def _failed(self, e):
+        """Back off after a failed poll and reprocess the next statistics page even if it is unchanged."""
+        # The digest of this poll's page is already recorded; without a reset the ranges that
+        # grew would never be fetched again unless the page changed once more
+        self.change_detector.reset()
+        delay = backoff_delay(self.failures)
+        self.failures += 1
+        self.last_error = str(e)
+        metrics.POLLS.inc(account=self.name, result="error")
+        metrics.CONSECUTIVE_FAILURES.set(self.failures, account=self.name)
+        print(f"[{self.name}] Error: {str(e)}. Retrying in {delay:.1f} seconds...")
+        return delay
+    
+    async def _poll(self):
+        # Fetch updated statistics
+        response = await self.session.call(payload_4, self.from_date, self.to_date)
+        self.failures = 0
+        self.last_error = None
+        metrics.CONSECUTIVE_FAILURES.set(0, account=self.name)
+        
+        # Skip parsing, diffing and saving when nothing changed
+        if not self.change_detector.changed(response.content):
+            print(f"[{self.name}] {self.change_detector.summary()}")
+            return self.interval.next()
+        
+        new_ranges = parse_statistics_table(response.text)
+        events = diff_ranges(new_ranges, self.existing_ranges)
+        for event in events:
+            if event.is_new:
+                print(f"New range detected: {event.range_name}")
+            else:
+                print(f"Count increased for {event.range_name}: {event.previous} -> {event.count} (+{event.increase})")
+        
+        # Range events -> number-fetch jobs -> SMS records -> sinks; a range's number ids
+        # are only committed once all its records are handled, so a failed poll retries them
+        progress = RangeProgress(on_complete=self.number_cache.commit)
+        jobs = buffered("numbers", self.fetch_jobs(events, progress))
+        records = buffered("messages", ordered_map(self.fetch_record, jobs, FETCH_CONCURRENCY))
+        try:
+            async for sms in records:
+                if await self.claim(sms):
+                    self.publish(sms)
+                progress.done(sms.range)
+        except Exception:
+            # Move the baseline past the ranges that were fully published, so the
+            # retry only re-diffs (and re-sends) the ranges that did not finish
+            if progress.completed:
+                self.existing_ranges = self.existing_ranges.updated(new_ranges, progress.completed)
+                await self.save(self.existing_ranges)
+            raise
+        
+        # Update existing ranges with any new data
+        self.existing_ranges = new_ranges
+        await self.save(self.existing_ranges)
+        return self.interval.next({event.range_name: event.increase for event in events})
+    
+    async def close(self):
+        await self.session.close()
+        self.state.close()
 
 async def start_command(update, context):
     """Handle /start command in Telegram."""
     await update.message.reply_text("IVASMS Bot started! Monitoring SMS statistics.")
 
+async def archive_command(update, context, reply):
+    """Answer an archive lookup with the messages of the accounts that notify this chat."""
+    archive = context.bot_data.get("archive")
+    if archive is None:
+        await update.message.reply_text("The SMS archive is disabled (ARCHIVE_PATH is empty).")
+        return
+    accounts = accounts_for_chat(context.bot_data.get("accounts", []), update.effective_chat.id)
+    if not accounts:
+        await update.message.reply_text("This chat does not receive any account's SMS.")
+        return
+    await update.message.reply_text(await asyncio.to_thread(reply, archive, context.args, accounts=accounts))
+
+async def otp_command(update, context):
+    """Handle /otp <number>: the last code archived for a number."""
+    await archive_command(update, context, otp_reply)
+
+async def range_command(update, context):
+    """Handle /range <range> [since]: archived messages in a range."""
+    await archive_command(update, context, range_reply)
+
 async def main():
     """Main function to execute automation and monitor SMS statistics."""
+    from telegram.ext import Application, CommandHandler
+    
+    # Health, metrics and (TELEGRAM_MODE=webhook) Telegram updates share one listener
+    health_server = HealthServer(port=METRICS_PORT) if METRICS_PORT or webhook_enabled() else None
+    if health_server:
+        await health_server.start()
+    watchdog = LoopWatchdog()
+    watchdog.start()
+    
+    # Every fetched SMS is archived for /otp and /range lookups
+    archive = open_archive()
+    
     # Set up Telegram bot with polling
-    application = Application.builder().token(BOT_TOKEN).build()
+    application = Application.builder().token(BOT_TOKEN).concurrent_updates(UPDATE_CONCURRENCY).build()
+    application.bot_data["archive"] = archive
     application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(CommandHandler("otp", otp_command))
+    application.add_handler(CommandHandler("range", range_command))
     await application.initialize()
     await application.start()
-    await application.updater.start_polling()
+    await start_updates(application, health_server)
     
-    # Calculate date range
-    today = datetime.now()
-    from_date = today.strftime("%m/%d/%Y")
-    to_date = (today + timedelta(days=1)).strftime("%m/%d/%Y")
+    # One long-lived bot and outbound queue shared by every notification
+    delivery = TelegramDelivery(application.bot)
+    delivery.start()
     
-    # Initialize JSON file
-    JSON_FILE = "sms_statistics.json"
-    session_start = time.time()
+    # Local notification sinks (NOTIFY_SINKS), each on its own worker
+    sinks = build_pipeline(delivery=delivery, chat_id=CHAT_ID, formatter=format_sms_message, archive=archive)
+    sinks.start()
     
-    while True:
-        try:
-            with requests.Session() as session:
-                # Step 1: Login
-                tokens = payload_1(session)
-                payload_2(session, tokens["_token"])
-                response, csrf_token = payload_3(session)
-                
-                # Step 2: Fetch initial statistics
-                response = payload_4(session, csrf_token, from_date, to_date)
-                ranges = parse_statistics(response.text)
-                
-                # Load existing statistics
-                existing_ranges = load_from_json(JSON_FILE)
-                existing_ranges_dict = {r["range_name"]: r for r in existing_ranges}
-                
-                # Save initial statistics if file doesn't exist or is empty
-                if not existing_ranges:
-                    save_to_json(ranges, JSON_FILE)
-                
-                # Step 3: Continuous monitoring
-                while True:
-                    # Check for session expiry (2 hours)
-                    if time.time() - session_start > 7200:
-                        break
-                    
-                    # Clear console
-                    os.system('cls' if os.name == 'nt' else 'clear')
-                    
-                    # Fetch updated statistics
-                    response = payload_4(session, csrf_token, from_date, to_date)
-                    new_ranges = parse_statistics(response.text)
-                    new_ranges_dict = {r["range_name"]: r for r in new_ranges}
-                    
-                    # Compare with existing ranges
-                    for range_data in new_ranges:
-                        range_name = range_data["range_name"]
-                        current_count = range_data["count"]
-                        existing_range = existing_ranges_dict.get(range_name)
-                        
-                        if not existing_range:
-                            print(f"New range detected: {range_name}")
-                            # Fetch numbers for the new range
-                            response = payload_5(session, csrf_token, to_date, range_name)
-                            numbers = parse_numbers(response.text)
-                            if numbers:
-                                # Process all numbers in the new range
-                                for number_data in numbers[::-1]:  # Process in reverse to get latest first
-                                    print(f"Fetching message for number: {number_data['number']}")
-                                    response = payload_6(session, csrf_token, to_date, number_data["number"], range_name)
-                                    message_data = parse_message(response.text)
-                                    
-                                    # Process notifications
-                                    sms = {
-                                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                        "number": number_data["number"],
-                                        "message": message_data["message"],
-                                        "range": range_name,
-                                        "revenue": message_data["revenue"]
-                                    }
-                                    print(f"New SMS: {sms}")
-                                    play_notification_sound()
-                                    show_notification(sms["number"], sms["message"])
-                                    await send_to_telegram(sms)
-                                
-                                # Update JSON with new range
-                                existing_ranges.append(range_data)
-                                existing_ranges_dict[range_name] = range_data
-                        
-                        elif current_count > existing_range["count"]:
-                            count_diff = current_count - existing_range["count"]
-                            print(f"Count increased for {range_name}: {existing_range['count']} -> {current_count} (+{count_diff})")
-                            # Fetch numbers for the range
-                            response = payload_5(session, csrf_token, to_date, range_name)
-                            numbers = parse_numbers(response.text)
-                            if numbers:
-                                # Process the last N numbers based on count_diff
-                                for number_data in numbers[-count_diff:][::-1]:  # Process last N in reverse
-                                    print(f"Fetching message for number: {number_data['number']}")
-                                    response = payload_6(session, csrf_token, to_date, number_data["number"], range_name)
-                                    message_data = parse_message(response.text)
-                                    
-                                    # Process notifications
-                                    sms = {
-                                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                        "number": number_data["number"],
-                                        "message": message_data["message"],
-                                        "range": range_name,
-                                        "revenue": message_data["revenue"]
-                                    }
-                                    print(f"New SMS: {sms}")
-                                    play_notification_sound()
-                                    show_notification(sms["number"], sms["message"])
-                                    await send_to_telegram(sms)
-                                
-                                # Update count in JSON
-                                for r in existing_ranges:
-                                    if r["range_name"] == range_name:
-                                        r["count"] = current_count
-                                        r["paid"] = range_data["paid"]
-                                        r["unpaid"] = range_data["unpaid"]
-                                        r["revenue"] = range_data["revenue"]
-                                        break
-                                existing_ranges_dict[range_name] = range_data
-                    
-                    # Update existing ranges with any new data
-                    existing_ranges = new_ranges
-                    existing_ranges_dict = new_ranges_dict
-                    save_to_json(existing_ranges, JSON_FILE)
-                    
-                    # Wait 2-3 seconds before next check
-                    await asyncio.sleep(2 + (time.time() % 1))
-                
-        except Exception as e:
-            print(f"Error: {str(e)}. Retrying in 30 seconds...")
-            await asyncio.sleep(30)
+    # Status dashboard (DASHBOARD=live|log|off) redrawn from the monitors' snapshots
+    dashboard = open_dashboard(summary=functools.partial(format_delivery_stats, delivery))
+    if dashboard:
+        dashboard.start()
+    
+    # Replicas share the accounts through leases (COORDINATOR); a single node polls them all
+    accounts = load_accounts()
+    # /otp and /range only show the SMS of the accounts notifying the asking chat
+    application.bot_data["accounts"] = accounts
+    coordinator = open_coordinator([account["name"] for account in accounts])
+    if coordinator:
+        await coordinator.start()
+    
+    # One monitor per account, all polled by the shared scheduler
+    monitors = [AccountMonitor(account, sinks, dashboard, coordinator) for account in accounts]
+    scheduler = PollScheduler()
+    for monitor in monitors:
+        if coordinator:
+            scheduler.add(monitor.name, coordinator.guard(monitor.name, monitor.poll, on_acquired=monitor.reset))
+        else:
+            scheduler.add(monitor.name, monitor.poll)
+    
+    try:
+        await scheduler.run()
+    finally:
+        if coordinator:
+            await coordinator.stop()
+        for monitor in monitors:
+            await monitor.close()
+        await sinks.stop()
+        # Send what the sinks handed over before the bot shuts down
+        await delivery.stop()
+        if dashboard:
+            await dashboard.stop()
+        if archive is not None:
+            archive.close()
+        await stop_updates(application)
+        await application.stop()
+        await application.shutdown()
+        if health_server:
+            await health_server.stop()
+        await watchdog.stop()
 
 if __name__ == "__main__":
     asyncio.run(main())
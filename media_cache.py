@@ -0,0 +1,91 @@
+import os
+import re
+import json
+import time
+import logging
+
+from state_store import write_json_snapshot
+
+logger = logging.getLogger(__name__)
+
+MEDIA_CACHE_FILE = os.getenv("MEDIA_CACHE_FILE", "media_cache.json")
+MEDIA_UPLOAD_TIMEOUT = float(os.getenv("MEDIA_UPLOAD_TIMEOUT", 15))
+# After a failed upload, send text-only for this long before trying the asset again
+MEDIA_RETRY_AFTER = float(os.getenv("MEDIA_RETRY_AFTER", 600))
+
+# BadRequest descriptions that mean the media itself (cached file_id or asset URL) is unusable;
+# anything else (e.g. "can't parse entities", "caption is too long") is about the caption
+MEDIA_ERROR_RE = re.compile(
+    r"file identifier|file reference|file_id|http url content|web page content|image_process_failed|photo_invalid",
+    re.IGNORECASE,
+)
+
+class MediaCache:
+    """Upload each media asset to Telegram once and reuse the returned file_id.
+
+    Assets are keyed by URL or local path and the file_ids are persisted to a
+    JSON file so restarts keep reusing them. If an upload or a cached file_id
+    fails, the message is sent as text only so delivery is never blocked on
+    the media host.
+    """
+
+    def __init__(self, filename=MEDIA_CACHE_FILE):
+        self.filename = filename
+        self.file_ids = {}
+        self._failed_at = {}
+        try:
+            if os.path.exists(filename):
+                with open(filename, 'r', encoding='utf-8') as f:
+                    self.file_ids = json.load(f)
+        except Exception as e:
+            logger.error(f"[MEDIA] Failed to load media cache: {e}")
+
+    def _save(self):
+        try:
+            write_json_snapshot(self.file_ids, self.filename)
+        except Exception as e:
+            logger.error(f"[MEDIA] Failed to save media cache: {e}")
+
+    def _forget(self, asset):
+        if self.file_ids.pop(asset, None) is not None:
+            self._save()
+
+    async def _upload(self, bot, chat_id, asset, **kwargs):
+        """Send asset as a new upload and remember its file_id."""
+        if os.path.exists(asset):
+            with open(asset, "rb") as f:
+                message = await bot.send_photo(chat_id=chat_id, photo=f, write_timeout=MEDIA_UPLOAD_TIMEOUT, **kwargs)
+        else:
+            message = await bot.send_photo(chat_id=chat_id, photo=asset, read_timeout=MEDIA_UPLOAD_TIMEOUT, **kwargs)
+        if message.photo:
+            self.file_ids[asset] = message.photo[-1].file_id
+            self._save()
+            logger.info(f"[MEDIA] Cached file_id for {asset}")
+        return message
+
+    async def send_photo(self, bot, chat_id, asset, caption, **kwargs):
+        """Send caption with the asset attached, falling back to a text-only message."""
+        from telegram.error import BadRequest, RetryAfter, TelegramError
+        file_id = self.file_ids.get(asset)
+        try:
+            if file_id:
+                return await bot.send_photo(chat_id=chat_id, photo=file_id, caption=caption, **kwargs)
+            if time.monotonic() - self._failed_at.get(asset, float("-inf")) > MEDIA_RETRY_AFTER:
+                return await self._upload(bot, chat_id, asset, caption=caption, **kwargs)
+        except BadRequest as e:
+            if MEDIA_ERROR_RE.search(str(e)):
+                logger.warning(f"[MEDIA] Telegram rejected {asset}: {e} - sending text only")
+                self._forget(asset)
+                self._failed_at[asset] = time.monotonic()
+            else:
+                # The media is fine; keep the file_id and only send this caption as text. Unformatted,
+                # as the same markup would be rejected again (e.g. "can't parse entities")
+                logger.warning(f"[MEDIA] Telegram rejected the caption: {e} - sending plain text only")
+                kwargs.pop("parse_mode", None)
+        except RetryAfter:
+            raise
+        except TelegramError as e:
+            logger.warning(f"[MEDIA] Media send failed for {asset}: {e} - sending text only")
+            self._failed_at[asset] = time.monotonic()
+
+        return await bot.send_message(chat_id=chat_id, text=caption, **kwargs)
@@ -0,0 +1,195 @@
+import os
+import time
+import bisect
+import threading
+
+# /healthz fails once an account has gone this long without a successful poll
+HEALTH_MAX_POLL_AGE = float(os.getenv("HEALTH_MAX_POLL_AGE", 300))
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PARSE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in key) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """Base for the Prometheus text-format metrics below (thread safe)."""
+
+    kind = "untyped"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, value in self.samples():
+            lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """A gauge set by the caller, or computed at scrape time by fn() -> {labels tuple: value}."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, fn=None):
+        super().__init__(name, help)
+        self.fn = fn
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def samples(self):
+        if self.fn is None:
+            return super().samples()
+        return [(self.name, tuple(labels), value) for labels, value in self.fn().items()]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def time(self, **labels):
+        """Context manager that observes the elapsed time of its block."""
+        return _Timer(self, labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key + (("le", _format_value(float(bound))),), cumulative))
+            samples.append((f"{self.name}_sum", key, total))
+            samples.append((f"{self.name}_count", key, cumulative))
+        return samples
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+REGISTRY = Registry()
+STARTED_AT = time.time()
+
+# Last successful poll per account, for /healthz and the staleness gauge
+last_success = {}
+
+def poll_succeeded(account):
+    last_success[account] = time.time()
+
+def register_account(account):
+    """Make an account count towards /healthz before its first successful poll."""
+    last_success.setdefault(account, None)
+
+def unregister_account(account):
+    """Stop counting an account towards /healthz (it is polled by another node)."""
+    last_success.pop(account, None)
+
+def poll_ages(now=None):
+    """Seconds since each account's last successful poll (since start-up if none yet)."""
+    now = time.time() if now is None else now
+    return {account: now - (at or STARTED_AT) for account, at in list(last_success.items())}
+
+def health(max_age=HEALTH_MAX_POLL_AGE):
+    """Return (ok, detail) where ok is False if any account's last good poll is too old."""
+    ages = poll_ages()
+    stale = sorted(account for account, age in ages.items() if age > max_age)
+    return not stale, {
+        "status": "stale" if stale else "ok",
+        "max_poll_age": max_age,
+        "poll_age_seconds": {account: round(age, 1) for account, age in ages.items()},
+        "stale_accounts": stale,
+    }
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "ivasms_request_duration_seconds", "Scrape request latency by endpoint path"))
+PARSE_SECONDS = REGISTRY.register(Histogram(
+    "ivasms_parse_duration_seconds", "Time to parse one page by page kind", PARSE_BUCKETS))
+POLLS = REGISTRY.register(Counter(
+    "ivasms_polls_total", "Polls run by account and result"))
+SMS_DETECTED = REGISTRY.register(Counter(
+    "ivasms_sms_detected_total", "New SMS detected by account"))
+SMS_DELIVERED = REGISTRY.register(Counter(
+    "ivasms_sms_delivered_total", "SMS notifications delivered to Telegram"))
+TELEGRAM_SEND_SECONDS = REGISTRY.register(Histogram(
+    "ivasms_telegram_send_duration_seconds", "Telegram Bot API call latency by method"))
+TELEGRAM_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "ivasms_telegram_queue_depth", "Messages waiting in the Telegram delivery queue"))
+POLL_UNCHANGED = REGISTRY.register(Counter(
+    "ivasms_poll_unchanged_total", "Polls whose statistics page was unchanged and skipped, by account"))
+POLL_CHANGED = REGISTRY.register(Counter(
+    "ivasms_poll_changed_total", "Polls whose statistics page changed and was parsed, by account"))
+POLL_INTERVAL = REGISTRY.register(Gauge(
+    "ivasms_poll_interval_seconds", "Delay before the next poll chosen by the adaptive interval, by account"))
+CONSECUTIVE_FAILURES = REGISTRY.register(Gauge(
+    "ivasms_consecutive_failures", "Consecutive failed polls by account"))
+LAST_POLL_AGE = REGISTRY.register(Gauge(
+    "ivasms_seconds_since_last_success", "Seconds since the last successful poll by account",
+    fn=lambda: {(("account", account),): age for account, age in poll_ages().items()}))
+PIPELINE_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "ivasms_pipeline_stage_seconds", "Time a detection pipeline stage spends producing one item"))
+LOOP_STALLS = REGISTRY.register(Counter(
+    "ivasms_event_loop_stalls_total", "Event loop stalls longer than STALL_THRESHOLD"))
+LOOP_STALL_SECONDS = REGISTRY.register(Histogram(
+    "ivasms_event_loop_stall_seconds", "Duration of event loop stalls longer than STALL_THRESHOLD"))
+SHARDS_OWNED = REGISTRY.register(Gauge(
+    "ivasms_shards_owned", "Accounts this node holds the lease for"))
@@ -0,0 +1,64 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+class NumberListCache:
+    """Remember the number_ids last seen in each range to find the new numbers.
+
+    The previous approach sliced the last N rows of the freshly downloaded
+    list, which silently misses or repeats numbers whenever the server orders
+    the list differently. Diffing on number_id does not depend on row order.
+
+    The ids of a list only become known once commit() is called for its
+    range, after the selected numbers' messages were published: a poll that
+    fails halfway selects the same numbers again on the retry.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._pending = {}
+        self.hits = 0
+        self.cold = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def forget(self, range_name):
+        self._ids.pop(range_name, None)
+        self._pending.pop(range_name, None)
+
+    def commit(self, range_name):
+        """Remember the ids of the list last passed to new_numbers() for range_name."""
+        ids = self._pending.pop(range_name, None)
+        if ids is not None:
+            self._ids[range_name] = ids
+
+    def new_numbers(self, range_name, numbers, expected=None):
+        """Return the rows of numbers that are new since the last call, in page order.
+
+        expected is the count increase reported by the statistics (None means
+        every row is new, e.g. for a range seen for the first time). With a
+        cold cache the last expected rows are used, as before. If fewer new
+        ids than expected show up (repeat SMS to a number already listed),
+        the most recent known rows make up the difference.
+        """
+        known = self._ids.get(range_name)
+        self._pending[range_name] = {n["number_id"] for n in numbers}
+
+        if expected is None:
+            return list(numbers)
+        if expected <= 0:
+            return []
+
+        if known is None:
+            self.cold += 1
+            return numbers[-expected:]
+
+        self.hits += 1
+        selected = {n["number_id"] for n in numbers if n["number_id"] not in known}
+        missing = expected - len(selected)
+        if missing > 0:
+            repeats = [n["number_id"] for n in numbers if n["number_id"] in known]
+            selected.update(repeats[-missing:])
+            logger.info(f"[NUMBERS] {range_name}: {missing} SMS on already listed numbers")
+        return [n for n in numbers if n["number_id"] in selected]
@@ -0,0 +1,298 @@
+import os
+import re
+import logging
+
+from metrics import PARSE_SECONDS
+from range_table import RangeTable
+
+logger = logging.getLogger(__name__)
+
+# Backend selection: "auto" picks the fastest installed backend
+PARSER_BACKEND = os.getenv("PARSER_BACKEND", "auto").lower()
+BACKEND_ORDER = ("selectolax", "lxml", "bs4")
+
+# Markup used by the ivasms portal pages
+RANGE_CARD_CLASS = "card card-body mb-1 pointer"
+NUMBER_CARD_CLASS = "card card-body border-bottom bg-100 p-2 rounded-0"
+MESSAGE_CLASS = "col-9 col-sm-6 text-center text-sm-start"
+REVENUE_CLASS = "col-3 col-sm-2 text-center text-sm-start"
+NO_SMS_TEXT = "You do not have any SMS"
+
+COL_CLASS_RE = re.compile(r'col-sm-\d+|col-\d+')
+RANGE_ID_RE = re.compile(r"getDetials\('([^']+)'\)")
+NUMBER_ONCLICK_RE = re.compile(r"'([^']+)','([^']+)'")
+
+def has_col_class(class_attr):
+    """Return True if a class attribute contains a col-N / col-sm-N class."""
+    return bool(class_attr) and COL_CLASS_RE.search(class_attr) is not None
+
+def build_range(range_name, count_text, paid_text, unpaid_text, revenue_text, onclick):
+    """Convert the text cells of a range card into a range dict."""
+    # Convert to appropriate types, with fallback to 0
+    try:
+        count = int(count_text) if count_text else 0
+        paid = int(paid_text) if paid_text else 0
+        unpaid = int(unpaid_text) if unpaid_text else 0
+        revenue = float(revenue_text) if revenue_text else 0.0
+    except ValueError:
+        count, paid, unpaid, revenue = 0, 0, 0, 0.0
+
+    # Extract range_id from onclick
+    range_id_match = RANGE_ID_RE.search(onclick or "")
+    range_id = range_id_match.group(1) if range_id_match else range_name
+
+    return {
+        "range_name": range_name,
+        "range_id": range_id,
+        "count": count,
+        "paid": paid,
+        "unpaid": unpaid,
+        "revenue": revenue
+    }
+
+def build_number(onclick):
+    """Extract a number dict from a number row onclick handler, or None."""
+    match = NUMBER_ONCLICK_RE.search(onclick or "")
+    if not match:
+        return None
+    number, number_id = match.groups()
+    return {"number": number, "number_id": number_id}
+
+class Bs4Parser:
+    """Reference backend built on BeautifulSoup's html.parser."""
+
+    name = "bs4"
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        self.BeautifulSoup = BeautifulSoup
+
+    def parse_statistics(self, response_text):
+        soup = self.BeautifulSoup(response_text, 'html.parser')
+        ranges = []
+
+        # Check for "no SMS" message
+        no_sms = soup.find('p', id='messageFlash')
+        if no_sms and NO_SMS_TEXT in no_sms.text:
+            return ranges
+
+        # Find all range cards
+        for card in soup.find_all('div', class_=RANGE_CARD_CLASS):
+            cols = card.find_all('div', class_=COL_CLASS_RE)
+            if len(cols) >= 5:
+                revenue_span = cols[4].find('span', class_='currency_cdr')
+                ranges.append(build_range(
+                    cols[0].text.strip(),
+                    cols[1].find('p').text.strip(),
+                    cols[2].find('p').text.strip(),
+                    cols[3].find('p').text.strip(),
+                    revenue_span.text.strip() if revenue_span else "0.0",
+                    card.get('onclick', '')
+                ))
+
+        return ranges
+
+    def parse_numbers(self, response_text):
+        soup = self.BeautifulSoup(response_text, 'html.parser')
+        numbers = []
+
+        for div in soup.find_all('div', class_=NUMBER_CARD_CLASS):
+            col = div.find('div', class_=COL_CLASS_RE)
+            number = build_number(col.get('onclick', '') if col else '')
+            if number:
+                numbers.append(number)
+
+        return numbers
+
+    def parse_message(self, response_text):
+        soup = self.BeautifulSoup(response_text, 'html.parser')
+        message_div = soup.find('div', class_=MESSAGE_CLASS)
+        revenue_div = soup.find('div', class_=REVENUE_CLASS)
+
+        message = message_div.find('p').text.strip() if message_div else "No message found"
+        revenue = revenue_div.find('span', class_='currency_cdr').text.strip() if revenue_div else "0.0"
+        return {"message": message, "revenue": revenue}
+
+class LxmlParser:
+    """libxml2 backend that evaluates XPath only over the cards we need."""
+
+    name = "lxml"
+
+    def __init__(self):
+        from lxml import html
+        self.html = html
+
+    def _root(self, response_text):
+        if not response_text or not response_text.strip():
+            return None
+        return self.html.fromstring(response_text)
+
+    @staticmethod
+    def _cols(node):
+        return [d for d in node.iter('div') if d is not node and has_col_class(d.get('class'))]
+
+    @staticmethod
+    def _first_text(node, xpath):
+        found = node.xpath(xpath)
+        return found[0].text_content().strip() if found else ""
+
+    def parse_statistics(self, response_text):
+        root = self._root(response_text)
+        ranges = []
+        if root is None:
+            return ranges
+
+        for no_sms in root.xpath('//p[@id="messageFlash"]'):
+            if NO_SMS_TEXT in no_sms.text_content():
+                return ranges
+
+        for card in root.xpath('//div[@class=$cls]', cls=RANGE_CARD_CLASS):
+            cols = self._cols(card)
+            if len(cols) >= 5:
+                revenue_text = self._first_text(cols[4], './/span[contains(concat(" ", @class, " "), " currency_cdr ")]')
+                ranges.append(build_range(
+                    cols[0].text_content().strip(),
+                    self._first_text(cols[1], './/p'),
+                    self._first_text(cols[2], './/p'),
+                    self._first_text(cols[3], './/p'),
+                    revenue_text or "0.0",
+                    card.get('onclick', '')
+                ))
+
+        return ranges
+
+    def parse_numbers(self, response_text):
+        root = self._root(response_text)
+        numbers = []
+        if root is None:
+            return numbers
+
+        for div in root.xpath('//div[@class=$cls]', cls=NUMBER_CARD_CLASS):
+            cols = self._cols(div)
+            number = build_number(cols[0].get('onclick', '') if cols else '')
+            if number:
+                numbers.append(number)
+
+        return numbers
+
+    def parse_message(self, response_text):
+        root = self._root(response_text)
+        message_div = root.xpath('//div[@class=$cls]', cls=MESSAGE_CLASS) if root is not None else []
+        revenue_div = root.xpath('//div[@class=$cls]', cls=REVENUE_CLASS) if root is not None else []
+
+        message = self._first_text(message_div[0], './/p') if message_div else "No message found"
+        revenue = self._first_text(revenue_div[0], './/span[contains(concat(" ", @class, " "), " currency_cdr ")]') if revenue_div else "0.0"
+        return {"message": message, "revenue": revenue}
+
+class SelectolaxParser:
+    """Lexbor backend - the fastest option when selectolax is installed."""
+
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self.HTMLParser = LexborHTMLParser
+
+    @staticmethod
+    def _exact(nodes, class_attr):
+        return [n for n in nodes if n.attributes.get('class') == class_attr]
+
+    @staticmethod
+    def _cols(node):
+        return [d for d in node.css('div') if has_col_class(d.attributes.get('class'))]
+
+    @staticmethod
+    def _first_text(node, selector):
+        found = node.css_first(selector)
+        return found.text(deep=True).strip() if found is not None else ""
+
+    def parse_statistics(self, response_text):
+        tree = self.HTMLParser(response_text)
+        ranges = []
+
+        no_sms = tree.css_first('p#messageFlash')
+        if no_sms is not None and NO_SMS_TEXT in no_sms.text(deep=True):
+            return ranges
+
+        for card in self._exact(tree.css('div.card.pointer'), RANGE_CARD_CLASS):
+            cols = self._cols(card)
+            if len(cols) >= 5:
+                ranges.append(build_range(
+                    cols[0].text(deep=True).strip(),
+                    self._first_text(cols[1], 'p'),
+                    self._first_text(cols[2], 'p'),
+                    self._first_text(cols[3], 'p'),
+                    self._first_text(cols[4], 'span.currency_cdr') or "0.0",
+                    card.attributes.get('onclick') or ''
+                ))
+
+        return ranges
+
+    def parse_numbers(self, response_text):
+        tree = self.HTMLParser(response_text)
+        numbers = []
+
+        for div in self._exact(tree.css('div.card.border-bottom'), NUMBER_CARD_CLASS):
+            cols = self._cols(div)
+            number = build_number((cols[0].attributes.get('onclick') or '') if cols else '')
+            if number:
+                numbers.append(number)
+
+        return numbers
+
+    def parse_message(self, response_text):
+        tree = self.HTMLParser(response_text)
+        message_div = self._exact(tree.css('div.col-9'), MESSAGE_CLASS)
+        revenue_div = self._exact(tree.css('div.col-3'), REVENUE_CLASS)
+
+        message = self._first_text(message_div[0], 'p') if message_div else "No message found"
+        revenue = self._first_text(revenue_div[0], 'span.currency_cdr') if revenue_div else "0.0"
+        return {"message": message, "revenue": revenue}
+
+BACKENDS = {
+    "bs4": Bs4Parser,
+    "lxml": LxmlParser,
+    "selectolax": SelectolaxParser,
+}
+
+_parsers = {}
+
+def get_parser(name=None):
+    """Return a cached parser backend, falling back through BACKEND_ORDER."""
+    name = (name or PARSER_BACKEND).lower()
+    if name in _parsers:
+        return _parsers[name]
+
+    candidates = BACKEND_ORDER if name == "auto" else (name,) + BACKEND_ORDER
+    for candidate in candidates:
+        if candidate not in BACKENDS:
+            logger.warning(f"[PARSER] Unknown parser backend: {candidate}")
+            continue
+        try:
+            parser = BACKENDS[candidate]()
+        except ImportError as e:
+            logger.warning(f"[PARSER] Backend {candidate} not available: {e}")
+            continue
+        logger.info(f"[PARSER] Using {parser.name} backend")
+        _parsers[name] = parser
+        return parser
+    raise ImportError("No HTML parser backend available (install selectolax, lxml or beautifulsoup4)")
+
+def parse_statistics(response_text):
+    """Parse SMS statistics from response and return range data."""
+    with PARSE_SECONDS.time(page="statistics"):
+        return get_parser().parse_statistics(response_text)
+
+def parse_statistics_table(response_text):
+    """Parse SMS statistics into a RangeTable."""
+    return RangeTable.from_dicts(parse_statistics(response_text))
+
+def parse_numbers(response_text):
+    """Parse numbers from the range response."""
+    with PARSE_SECONDS.time(page="numbers"):
+        return get_parser().parse_numbers(response_text)
+
+def parse_message(response_text):
+    """Parse message details from response."""
+    with PARSE_SECONDS.time(page="message"):
+        return get_parser().parse_message(response_text)
@@ -0,0 +1,176 @@
+import os
+import time
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field, fields
+
+from metrics import PIPELINE_STAGE_SECONDS
+from range_table import diff_counts
+
+# Items buffered between two detection pipeline stages before the upstream stage waits
+PIPELINE_STAGE_BUFFER = int(os.getenv("PIPELINE_STAGE_BUFFER", 16))
+
+@dataclass(slots=True, frozen=True)
+class RangeEvent:
+    """A range whose SMS count went up between two statistics polls."""
+
+    range_name: str
+    count: int
+    previous: int | None = None  # None for a range seen for the first time
+
+    @property
+    def is_new(self):
+        return self.previous is None
+
+    @property
+    def increase(self):
+        return self.count - (self.previous or 0)
+
+    @property
+    def expected(self):
+        """New rows expected in the number list (None means all of them)."""
+        return None if self.is_new else self.increase
+
+@dataclass(slots=True, frozen=True)
+class FetchJob:
+    """One number whose latest message has to be fetched."""
+
+    range_name: str
+    number: str
+    number_id: str
+
+@dataclass(slots=True)
+class SmsRecord:
+    """A detected SMS as handed to the notification sinks.
+
+    Sinks and formatters index it like the dicts they used to get
+    (sms["number"], sms.get("chat_id")).
+    """
+
+    timestamp: str
+    number: str
+    message: str
+    range: str
+    revenue: str
+    account: str = None
+    chat_id: str = None
+    # Identifies this message among identical ones (the portal's number id)
+    message_id: str = None
+    detected_at: float = field(default_factory=time.monotonic, repr=False)
+    # Called by the delivery queue once the notification was sent or could not be
+    on_sent: object = field(default=None, repr=False, compare=False)
+    on_failed: object = field(default=None, repr=False, compare=False)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def as_dict(self):
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name not in ("detected_at", "on_sent", "on_failed")}
+
+def diff_ranges(ranges, previous):
+    """Return a RangeEvent for every range in ranges that is new or grew since previous.
+
+    Both are RangeTables; the counts are compared in one pass (see diff_counts).
+    """
+    rows, counts = diff_counts(previous, ranges)
+    names, count = ranges.names, ranges.count
+    return [RangeEvent(names[i], count[i], None if old < 0 else old) for i, old in zip(rows, counts)]
+
+class RangeProgress:
+    """Track which ranges of a poll have had every record handled.
+
+    The number stage calls expect() with the jobs it queued for a range
+    before yielding them; the consumer calls done() per handled record.
+    on_complete(range_name) runs once a range has nothing outstanding.
+    """
+
+    def __init__(self, on_complete=None):
+        self.on_complete = on_complete
+        self.outstanding = {}
+        self.completed = []
+
+    def expect(self, range_name, jobs):
+        if jobs:
+            self.outstanding[range_name] = jobs
+        else:
+            self._complete(range_name)
+
+    def done(self, range_name):
+        self.outstanding[range_name] -= 1
+        if not self.outstanding[range_name]:
+            del self.outstanding[range_name]
+            self._complete(range_name)
+
+    def _complete(self, range_name):
+        self.completed.append(range_name)
+        if self.on_complete is not None:
+            self.on_complete(range_name)
+
+async def buffered(stage, source, maxsize=PIPELINE_STAGE_BUFFER):
+    """Run the async iterator source ahead of its consumer behind a bounded queue.
+
+    The stage keeps producing while the consumer is busy and waits once
+    maxsize items are buffered (backpressure). The time taken to produce
+    each item is observed per stage. Errors in the stage are raised to the
+    consumer; closing the consumer cancels the stage.
+    """
+    queue = asyncio.Queue(maxsize)
+    end = object()
+
+    async def pump():
+        try:
+            started = time.perf_counter()
+            async for item in source:
+                PIPELINE_STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+                await queue.put(item)
+                started = time.perf_counter()
+        except Exception as e:
+            await queue.put(_Failed(e))
+        else:
+            await queue.put(end)
+        finally:
+            await source.aclose()
+
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            item = await queue.get()
+            if item is end:
+                return
+            if isinstance(item, _Failed):
+                raise item.error
+            yield item
+    finally:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+async def ordered_map(fn, source, concurrency):
+    """Yield await fn(item) for each item of source, up to concurrency calls at once, in input order."""
+    pending = deque()
+    try:
+        async for item in source:
+            pending.append(asyncio.ensure_future(fn(item)))
+            if len(pending) >= concurrency:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+class _Failed:
+    __slots__ = ("error",)
+
+    def __init__(self, error):
+        self.error = error
@@ -0,0 +1,159 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+# Default delay between two polls of the same account (seconds)
+POLL_INTERVAL = float(os.getenv("POLL_INTERVAL", 2.5))
+# Polls allowed to run at the same time across all accounts
+MAX_CONCURRENT_POLLS = int(os.getenv("MAX_CONCURRENT_POLLS", 4))
+
+# Adaptive interval bounds (seconds) and tuning
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", 1.5))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", 30))
+POLL_BACKOFF = float(os.getenv("POLL_BACKOFF", 1.5))
+# Half-life of the per-range arrival rate estimate
+RATE_HALF_LIFE = float(os.getenv("RATE_HALF_LIFE", 600))
+# Aim for this many polls per expected SMS arrival
+POLLS_PER_ARRIVAL = float(os.getenv("POLLS_PER_ARRIVAL", 4))
+
+def parse_retry_after(value, default=None):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+class AdaptiveInterval:
+    """Choose the next poll delay from the observed SMS arrival rate.
+
+    Per-range arrival rates are tracked as exponentially decaying averages of
+    the count increases seen in each stats diff. Any arrival snaps the
+    interval to the minimum; idle polls grow it by the backoff factor, but
+    never past POLLS_PER_ARRIVAL polls per expected arrival, and never past
+    the maximum. A server Retry-After always wins.
+    """
+
+    def __init__(self, min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL,
+                 backoff=POLL_BACKOFF, half_life=RATE_HALF_LIFE, jitter=0.1):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.half_life = half_life
+        self.jitter = jitter
+        self.current = min_interval
+        self.rates = {}
+        self._last = time.monotonic()
+        self._retry_until = 0.0
+
+    @property
+    def total_rate(self):
+        """Estimated SMS arrivals per second across all ranges."""
+        return sum(self.rates.values())
+
+    def observe(self, arrivals, now=None):
+        """Fold {range_name: new_sms_count} from one poll into the rate estimates."""
+        now = time.monotonic() if now is None else now
+        dt = max(now - self._last, 1e-3)
+        self._last = now
+        decay = 0.5 ** (dt / self.half_life)
+        for name in set(self.rates) | set(arrivals):
+            rate = self.rates.get(name, 0.0) * decay + (1 - decay) * arrivals.get(name, 0) / dt
+            if rate < 1e-7:
+                self.rates.pop(name, None)
+            else:
+                self.rates[name] = rate
+
+    def next(self, arrivals=None, now=None):
+        """Record a poll's arrivals and return the delay before the next poll."""
+        now = time.monotonic() if now is None else now
+        arrivals = {name: n for name, n in (arrivals or {}).items() if n > 0}
+        self.observe(arrivals, now)
+
+        if arrivals:
+            self.current = self.min_interval
+        else:
+            interval = min(self.max_interval, self.current * self.backoff)
+            total = self.total_rate
+            if total > 0:
+                interval = min(interval, max(self.min_interval, 1 / (total * POLLS_PER_ARRIVAL)))
+            self.current = interval
+
+        delay = self.current * random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(delay, self._retry_until - now)
+
+    def throttled(self, retry_after=None, now=None):
+        """Record a 429 and return the delay the server asked for (or a backed-off one)."""
+        now = time.monotonic() if now is None else now
+        if retry_after is None:
+            retry_after = min(self.max_interval, self.current * self.backoff * 2)
+        self.current = min(self.max_interval, max(self.current, retry_after))
+        self._retry_until = now + retry_after
+        return retry_after
+
+    def stats(self):
+        return {
+            "interval": self.current,
+            "total_rate": self.total_rate,
+            "active_ranges": len(self.rates),
+        }
+
+class PollScheduler:
+    """Run the poll jobs of many accounts on one event loop.
+
+    Jobs start staggered evenly across the interval so N accounts do not all
+    hit the server at once, and a shared semaphore caps how many polls are in
+    flight. A job may return the delay before its next run; None means the
+    default interval.
+    """
+
+    def __init__(self, interval=POLL_INTERVAL, max_concurrent=MAX_CONCURRENT_POLLS):
+        self.interval = interval
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.jobs = []
+        self.runs = {}
+        self.last_run = {}
+        self._tasks = []
+
+    def add(self, name, job):
+        """Register an async callable to be polled repeatedly."""
+        self.jobs.append((name, job))
+        self.runs[name] = 0
+
+    async def run(self):
+        """Run every job until cancelled."""
+        count = len(self.jobs)
+        self._tasks = [
+            asyncio.create_task(self._run_job(i * self.interval / count, name, job))
+            for i, (name, job) in enumerate(self.jobs)
+        ]
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            for task in self._tasks:
+                task.cancel()
+
+    async def _run_job(self, offset, name, job):
+        await asyncio.sleep(offset)
+        while True:
+            async with self.semaphore:
+                try:
+                    delay = await job()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"[SCHEDULER] Poll for {name} failed: {e}")
+                    delay = None
+            self.runs[name] += 1
+            self.last_run[name] = time.time()
+            await asyncio.sleep(self.interval if delay is None else delay)
@@ -0,0 +1,193 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import httpx
+
+from http_client import create_client
+
+logger = logging.getLogger(__name__)
+
+# Refresh the CSRF token / session cookie this many seconds before it expires
+SESSION_REFRESH_MARGIN = float(os.getenv("SESSION_REFRESH_MARGIN", 300))
+# Used when the server does not send an expiring session cookie
+SESSION_REFRESH_INTERVAL = float(os.getenv("SESSION_REFRESH_INTERVAL", 1800))
+# Jittered exponential backoff bounds for failed logins and polls
+BACKOFF_BASE = float(os.getenv("BACKOFF_BASE", 2))
+BACKOFF_CAP = float(os.getenv("BACKOFF_CAP", 120))
+# Login attempts per relogin() before the error is raised to the poll loop
+LOGIN_ATTEMPTS = int(os.getenv("LOGIN_ATTEMPTS", 3))
+
+# Status codes that mean the session or CSRF token is no longer valid
+AUTH_EXPIRED_STATUSES = (401, 419)
+
+class SessionExpired(Exception):
+    """Raised when ivasms redirects to /login or rejects the session."""
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Return a jittered exponential backoff delay for the given attempt (0-based)."""
+    return random.uniform(base / 2, min(cap, base * (2 ** attempt)))
+
+def is_login_redirect(response):
+    """Return True if a response ended up on the login page."""
+    return response is not None and str(getattr(response, "url", "")).rstrip("/").endswith("/login")
+
+class SessionManager:
+    """Own the HTTP client, cookies and CSRF token for one ivasms account.
+
+    login(client) must perform the full login and return the CSRF token, and
+    refresh(client) must return a fresh CSRF token for the existing session
+    (raising SessionExpired if the server sends it back to /login). A
+    background task refreshes the token before the session cookie expires;
+    a full re-login only happens on 401/419 or a redirect to /login.
+    """
+
+    def __init__(self, login, refresh, headers=None, account=None):
+        self._login = login
+        self._refresh = refresh
+        self.headers = headers
+        self.account = account
+        self.client = None
+        self.csrf_token = None
+        self.token_obtained_at = 0.0
+        self.generation = 0
+        self.logins = 0
+        self.refreshes = 0
+        self.login_failures = 0
+        self._lock = asyncio.Lock()
+        self._refresh_task = None
+
+    @property
+    def authenticated(self):
+        return self.client is not None and self.csrf_token is not None
+
+    def session_expires_at(self):
+        """Return the earliest expiry of the session cookies, or None if they have none."""
+        if self.client is None:
+            return None
+        expiries = [c.expires for c in self.client.cookies.jar if c.expires]
+        return min(expiries) if expiries else None
+
+    def refresh_in(self):
+        """Seconds until the token should be refreshed."""
+        expires_at = self.session_expires_at()
+        if expires_at is not None:
+            return max(5.0, expires_at - time.time() - SESSION_REFRESH_MARGIN)
+        return max(5.0, self.token_obtained_at + SESSION_REFRESH_INTERVAL - time.time())
+
+    async def start(self):
+        """Log in if needed and start the background refresh task."""
+        if not self.authenticated:
+            await self.relogin(self.generation)
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        self.csrf_token = None
+
+    async def relogin(self, seen_generation):
+        """Log in again unless another task already did since seen_generation.
+
+        Makes up to LOGIN_ATTEMPTS backed-off attempts, then raises the last
+        error so the caller's own backoff and failure reporting take over
+        (the lock is not held while the account is failing).
+        """
+        async with self._lock:
+            if self.generation != seen_generation and self.authenticated:
+                return
+            for attempt in range(LOGIN_ATTEMPTS):
+                if self.client is not None:
+                    await self.client.aclose()
+                self.client = create_client(self.headers, account=self.account)
+                self.csrf_token = None
+                try:
+                    self.csrf_token = await self._login(self.client)
+                except Exception as e:
+                    self.login_failures += 1
+                    if attempt + 1 >= LOGIN_ATTEMPTS:
+                        logger.error(f"[SESSION] Login failed ({e}), giving up after {LOGIN_ATTEMPTS} attempt(s)")
+                        raise
+                    delay = backoff_delay(attempt)
+                    logger.error(f"[SESSION] Login failed ({e}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                self.token_obtained_at = time.time()
+                self.generation += 1
+                self.logins += 1
+                self.login_failures = 0
+                logger.info(f"[SESSION] Logged in (login #{self.logins})")
+                return
+
+    async def refresh_token(self):
+        """Fetch a fresh CSRF token for the current session, re-logging in if it expired."""
+        seen = self.generation
+        async with self._lock:
+            if self.generation != seen:
+                return
+            try:
+                self.csrf_token = await self._refresh(self.client)
+                self.token_obtained_at = time.time()
+                self.refreshes += 1
+                logger.info("[SESSION] CSRF token refreshed")
+                return
+            except SessionExpired:
+                logger.warning("[SESSION] Session expired during refresh")
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in AUTH_EXPIRED_STATUSES:
+                    raise
+                logger.warning(f"[SESSION] Refresh rejected with {e.response.status_code}")
+        await self.relogin(seen)
+
+    async def _refresh_loop(self):
+        failures = 0
+        while True:
+            await asyncio.sleep(self.refresh_in() if not failures else backoff_delay(failures))
+            try:
+                await self.refresh_token()
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                logger.error(f"[SESSION] Background refresh failed: {e}")
+
+    async def call(self, fn, *args, **kwargs):
+        """Run fn(client, csrf_token, *args) and recover once from an expired session.
+
+        A 419 (CSRF mismatch) first tries a token refresh; a 401 or a redirect to
+        /login triggers a re-login. Any other error propagates to the caller.
+        """
+        if not self.authenticated:
+            await self.start()
+        for attempt in range(2):
+            seen = self.generation
+            try:
+                response = await fn(self.client, self.csrf_token, *args, **kwargs)
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                if status not in AUTH_EXPIRED_STATUSES or attempt:
+                    raise
+                logger.warning(f"[SESSION] {status} from {e.request.url.path}, recovering session")
+                if status == 419:
+                    await self.refresh_token()
+                else:
+                    await self.relogin(seen)
+                continue
+            if is_login_redirect(response):
+                if attempt:
+                    raise SessionExpired("Redirected to /login after re-login")
+                logger.warning("[SESSION] Redirected to /login, logging in again")
+                await self.relogin(seen)
+                continue
+            return response
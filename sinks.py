@@ -0,0 +1,199 @@
+import os
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Comma separated list of enabled sinks: sound, desktop, telegram, archive (or "none")
+NOTIFY_SINKS = os.getenv("NOTIFY_SINKS", "sound,desktop,telegram,archive")
+SINK_QUEUE_SIZE = int(os.getenv("SINK_QUEUE_SIZE", 100))
+NOTIFICATION_SOUND = os.getenv("NOTIFICATION_SOUND", os.path.join("src", "notification.mp3"))
+
+class Sink:
+    """A notification target with its own worker and bounded queue.
+
+    submit() never blocks the caller. When the queue is full the oldest item is
+    dropped. With coalesce=True the worker hands everything queued so far to
+    handle() as one batch, so a burst produces one notification.
+    """
+
+    name = "sink"
+    coalesce = False
+
+    def __init__(self, maxsize=SINK_QUEUE_SIZE):
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self.handled = 0
+        self._worker = None
+
+    def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def submit(self, sms):
+        """Queue an SMS for this sink without waiting."""
+        try:
+            self.queue.put_nowait(sms)
+        except asyncio.QueueFull:
+            self.queue.get_nowait()
+            self.queue.put_nowait(sms)
+            self.dropped += 1
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            if self.coalesce:
+                while not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+            try:
+                if self.coalesce:
+                    await self.handle(batch)
+                else:
+                    for sms in batch:
+                        await self.handle([sms])
+                self.handled += len(batch)
+            except Exception as e:
+                logger.error(f"[SINK] {self.name} failed: {e}")
+
+    async def handle(self, batch):
+        raise NotImplementedError
+
+class SoundSink(Sink):
+    """Play one chime per burst of messages."""
+
+    name = "sound"
+    coalesce = True
+
+    def __init__(self, path=NOTIFICATION_SOUND, **kwargs):
+        super().__init__(**kwargs)
+        from playsound import playsound
+        self.playsound = playsound
+        self.path = path
+
+    async def handle(self, batch):
+        await asyncio.to_thread(self.playsound, self.path)
+        logger.info(f"[SINK] Played notification sound for {len(batch)} SMS")
+
+class DesktopSink(Sink):
+    """Show a desktop notification, summarising bursts into one popup."""
+
+    name = "desktop"
+    coalesce = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        from plyer import notification
+        self.notification = notification
+
+    async def handle(self, batch):
+        if len(batch) == 1:
+            title = f"New SMS on +{batch[0]['number']}"
+            message = batch[0]["message"][:100]
+        else:
+            title = f"{len(batch)} new SMS"
+            message = ", ".join(f"+{sms['number']}" for sms in batch)[:100]
+        await asyncio.to_thread(
+            self.notification.notify,
+            title=title,
+            message=message,
+            app_name="IVASMS Monitor",
+            timeout=10
+        )
+        logger.info(f"[SINK] Displayed notification: {title}")
+
+class TelegramSink(Sink):
+    """Hand every SMS to the Telegram delivery queue (never dropped or merged here).
+
+    The SMS may carry its own chat_id (per-account chats); otherwise chat_id is used.
+    """
+
+    name = "telegram"
+
+    def __init__(self, delivery, chat_id, formatter, **kwargs):
+        kwargs.setdefault("maxsize", 0)
+        super().__init__(**kwargs)
+        self.delivery = delivery
+        self.chat_id = chat_id
+        self.formatter = formatter
+
+    async def handle(self, batch):
+        for sms in batch:
+            self.delivery.enqueue(chat_id=sms.get("chat_id") or self.chat_id, text=self.formatter(sms),
+                                  on_sent=sms.get("on_sent"), on_failed=sms.get("on_failed"))
+
+class ArchiveSink(Sink):
+    """Write every SMS to the SQLite archive, one transaction per burst, off the event loop."""
+
+    name = "archive"
+    coalesce = True
+
+    def __init__(self, archive, **kwargs):
+        kwargs.setdefault("maxsize", 0)
+        super().__init__(**kwargs)
+        self.archive = archive
+
+    async def handle(self, batch):
+        await asyncio.to_thread(self.archive.add_many, batch)
+
+    async def stop(self):
+        await super().stop()
+        # Unlike notifications, queued records are still worth writing at shutdown
+        batch = []
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        if batch:
+            await asyncio.to_thread(self.archive.add_many, batch)
+
+class SinkPipeline:
+    """Fan an SMS out to every enabled sink."""
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def start(self):
+        for sink in self.sinks:
+            sink.start()
+
+    async def stop(self):
+        for sink in self.sinks:
+            await sink.stop()
+
+    def publish(self, sms):
+        for sink in self.sinks:
+            sink.submit(sms)
+
+    def stats(self):
+        return {sink.name: {"queued": sink.queue.qsize(), "handled": sink.handled, "dropped": sink.dropped}
+                for sink in self.sinks}
+
+def build_pipeline(names=None, delivery=None, chat_id=None, formatter=None, archive=None):
+    """Build a pipeline from a comma separated sink list; only enabled sinks are imported."""
+    names = [n.strip().lower() for n in (names or NOTIFY_SINKS).split(",") if n.strip()]
+    sinks = []
+    for name in names:
+        try:
+            if name == "sound":
+                sinks.append(SoundSink())
+            elif name == "desktop":
+                sinks.append(DesktopSink())
+            elif name == "telegram":
+                if delivery is not None:
+                    sinks.append(TelegramSink(delivery, chat_id, formatter))
+            elif name == "archive":
+                if archive is not None:
+                    sinks.append(ArchiveSink(archive))
+            elif name != "none":
+                logger.warning(f"[SINK] Unknown sink: {name}")
+        except ImportError as e:
+            logger.warning(f"[SINK] {name} sink disabled: {e}")
+    logger.info(f"[SINK] Enabled sinks: {', '.join(s.name for s in sinks) or 'none'}")
+    return SinkPipeline(sinks)
@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+
+from range_table import RangeTable
+
+logger = logging.getLogger(__name__)
+
+# State backend: sqlite (default), journal or json
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite").lower()
+LEGACY_JSON_FILE = "sms_statistics.json"
+
+# Appended journal batches before the journal is folded into the snapshot
+JOURNAL_COMPACT_EVERY = int(os.getenv("STATE_COMPACT_EVERY", 500))
+
+RANGE_FIELDS = ("range_id", "count", "paid", "unpaid", "revenue")
+
+def _row(range_data):
+    """Return the comparable value tuple of a range dict."""
+    return tuple(range_data.get(field) for field in RANGE_FIELDS)
+
+def _range(range_name, row):
+    """Rebuild a range dict from its name and value tuple."""
+    data = {"range_name": range_name}
+    data.update(zip(RANGE_FIELDS, row))
+    return data
+
+def read_json_snapshot(filename):
+    """Read a list of range dicts from a JSON file, [] if missing or corrupt."""
+    try:
+        if os.path.exists(filename):
+            with open(filename, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, list) else []
+        return []
+    except Exception as e:
+        logger.error(f"[STATE] Failed to load {filename}: {e}")
+        return []
+
+def write_json_snapshot(data, filename):
+    """Atomically replace filename with data (write to temp, fsync, rename)."""
+    tmp = f"{filename}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filename)
+
+class StateStore:
+    """Base class tracking the last saved snapshot so only deltas are written."""
+
+    def __init__(self):
+        self._snapshot = {}
+        self._order = []
+
+    def load(self):
+        """Return the stored ranges as a list of dicts."""
+        self._snapshot = self._load_rows()
+        self._order = list(self._snapshot)
+        return [_range(name, row) for name, row in self._snapshot.items()]
+
+    def save(self, ranges):
+        """Persist ranges, writing only ranges that were added, changed or removed.
+
+        ranges is a RangeTable or a list of range dicts. Returns the number
+        of ranges that were added, changed or removed.
+        """
+        if isinstance(ranges, RangeTable):
+            new_snapshot = ranges.rows()
+        else:
+            new_snapshot = {r["range_name"]: _row(r) for r in ranges}
+        changed = {
+            name: row for name, row in new_snapshot.items()
+            if self._snapshot.get(name) != row
+        }
+        removed = [name for name in self._snapshot if name not in new_snapshot]
+        order = list(new_snapshot)
+        if not changed and not removed and order == self._order:
+            return 0
+
+        self._commit(changed, removed, order, new_snapshot)
+        self._snapshot = new_snapshot
+        self._order = order
+        return len(changed) + len(removed)
+
+    def close(self):
+        pass
+
+    def _load_rows(self):
+        raise NotImplementedError
+
+    def _commit(self, changed, removed, order, snapshot):
+        raise NotImplementedError
+
+class JsonStateStore(StateStore):
+    """Whole-file JSON snapshot, kept for compatibility with sms_statistics.json."""
+
+    def __init__(self, filename=LEGACY_JSON_FILE):
+        super().__init__()
+        self.filename = filename
+
+    def _load_rows(self):
+        return {r["range_name"]: _row(r) for r in read_json_snapshot(self.filename)}
+
+    def _commit(self, changed, removed, order, snapshot):
+        write_json_snapshot([_range(name, snapshot[name]) for name in order], self.filename)
+
+class JournalStateStore(StateStore):
+    """Append-only journal of range deltas on top of a JSON snapshot.
+
+    Every save appends one JSON line holding the changed and removed ranges and
+    fsyncs it, so a crash can at worst leave a torn final line that is ignored
+    on load. Every JOURNAL_COMPACT_EVERY batches the current state is written
+    to the snapshot file atomically and the journal is truncated.
+    """
+
+    def __init__(self, filename=LEGACY_JSON_FILE, compact_every=JOURNAL_COMPACT_EVERY):
+        super().__init__()
+        self.filename = filename
+        self.journal_file = f"{filename}.journal"
+        self.compact_every = compact_every
+        self._batches = 0
+        self._journal = None
+
+    def _load_rows(self):
+        rows = {r["range_name"]: _row(r) for r in read_json_snapshot(self.filename)}
+        order = list(rows)
+        self._batches = 0
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'rb+') as f:
+                good = 0
+                for line in f:
+                    try:
+                        batch = json.loads(line)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        # Drop the torn tail so later appends start on a clean line
+                        logger.warning("[STATE] Truncating torn journal entry")
+                        f.truncate(good)
+                        break
+                    good += len(line)
+                    for name in batch.get("del", []):
+                        rows.pop(name, None)
+                    for name, row in batch.get("set", {}).items():
+                        rows[name] = tuple(row)
+                    order = batch.get("order", order)
+                    self._batches += 1
+        return {name: rows[name] for name in order if name in rows}
+
+    def _commit(self, changed, removed, order, snapshot):
+        if self._batches >= self.compact_every:
+            self.compact(snapshot, order)
+            return
+        if self._journal is None:
+            self._journal = open(self.journal_file, 'a', encoding='utf-8')
+        batch = {"ts": time.time(), "set": changed, "del": removed}
+        if order != self._order:
+            batch["order"] = order
+        self._journal.write(json.dumps(batch, separators=(",", ":")) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._batches += 1
+
+    def compact(self, snapshot=None, order=None):
+        """Fold the journal into the snapshot file and start a new journal."""
+        snapshot = self._snapshot if snapshot is None else snapshot
+        order = self._order if order is None else order
+        write_json_snapshot([_range(name, snapshot[name]) for name in order], self.filename)
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_file, 'w', encoding='utf-8')
+        self._batches = 0
+        logger.info(f"[STATE] Compacted journal into {self.filename}")
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+class SqliteStateStore(StateStore):
+    """Per-range rows in SQLite (WAL mode), each save is one transaction."""
+
+    def __init__(self, filename="sms_statistics.db", legacy_json=LEGACY_JSON_FILE):
+        super().__init__()
+        self.filename = filename
+        self.conn = sqlite3.connect(filename)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ranges ("
+            "range_name TEXT PRIMARY KEY, range_id TEXT, count INTEGER, paid INTEGER, "
+            "unpaid INTEGER, revenue REAL, position INTEGER, updated_at REAL)"
+        )
+        self.conn.commit()
+        if legacy_json:
+            self.migrate_json(legacy_json)
+
+    def migrate_json(self, filename):
+        """Import an existing sms_statistics.json once, into an empty database."""
+        if self.conn.execute("SELECT 1 FROM ranges LIMIT 1").fetchone():
+            return 0
+        ranges = read_json_snapshot(filename)
+        if not ranges:
+            return 0
+        snapshot = {r["range_name"]: _row(r) for r in ranges}
+        self._commit(snapshot, [], list(snapshot), snapshot)
+        logger.info(f"[STATE] Migrated {len(snapshot)} ranges from {filename}")
+        return len(snapshot)
+
+    def _load_rows(self):
+        cursor = self.conn.execute(
+            "SELECT range_name, range_id, count, paid, unpaid, revenue FROM ranges ORDER BY position"
+        )
+        return {row[0]: tuple(row[1:]) for row in cursor}
+
+    def _commit(self, changed, removed, order, snapshot):
+        now = time.time()
+        positions = {name: i for i, name in enumerate(order)}
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM ranges WHERE range_name = ?",
+                [(name,) for name in removed]
+            )
+            self.conn.executemany(
+                "INSERT INTO ranges (range_name, range_id, count, paid, unpaid, revenue, position, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(range_name) DO UPDATE SET range_id=excluded.range_id, count=excluded.count, "
+                "paid=excluded.paid, unpaid=excluded.unpaid, revenue=excluded.revenue, "
+                "position=excluded.position, updated_at=excluded.updated_at",
+                [(name, *row, positions[name], now) for name, row in changed.items()]
+            )
+            if order != self._order:
+                self.conn.executemany(
+                    "UPDATE ranges SET position = ? WHERE range_name = ?",
+                    [(i, name) for i, name in enumerate(order) if name not in changed]
+                )
+
+    def close(self):
+        self.conn.close()
+
+def default_state_path(backend, account=None):
+    """Return the default file for a backend; named accounts get their own file."""
+    base = "sms_statistics" if account in (None, "default") else f"sms_statistics_{account}"
+    return base + (".db" if backend == "sqlite" else ".json")
+
+def open_state_store(backend=None, path=None, account=None):
+    """Create the configured state backend for an account."""
+    backend = (backend or STATE_BACKEND).lower()
+    if path is None and account in (None, "default"):
+        path = os.getenv("STATE_PATH")
+    path = path or default_state_path(backend, account)
+    if backend == "sqlite":
+        return SqliteStateStore(path, legacy_json=default_state_path("json", account))
+    if backend == "journal":
+        return JournalStateStore(path)
+    if backend == "json":
+        return JsonStateStore(path)
+    raise ValueError(f"Unknown state backend: {backend}")
@@ -0,0 +1,75 @@
+import os
+import hmac
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How Telegram updates (commands) reach the bot: polling (getUpdates long-poll) or webhook
+TELEGRAM_MODE = os.getenv("TELEGRAM_MODE", "polling").lower()
+# Public base URL Telegram posts updates to (Render sets RENDER_EXTERNAL_URL)
+WEBHOOK_URL = (os.getenv("WEBHOOK_URL") or os.getenv("RENDER_EXTERNAL_URL") or "").rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+# Telegram sends this back in X-Telegram-Bot-Api-Secret-Token; derived from the bot token if unset
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+# Updates handled at the same time
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", 16))
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+def webhook_enabled():
+    return TELEGRAM_MODE == "webhook"
+
+def webhook_secret(bot_token):
+    """The configured secret token, or one derived from the bot token (Telegram allows [A-Za-z0-9_-])."""
+    return WEBHOOK_SECRET or hashlib.sha256(f"webhook:{bot_token}".encode()).hexdigest()[:48]
+
+def webhook_handler(application, secret):
+    """Health server handler that verifies an update from Telegram and queues it for the handlers."""
+    from telegram import Update
+    expected = secret.encode()
+
+    async def handle(request):
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, "").encode(), expected):
+            logger.warning("[WEBHOOK] Rejected an update with a missing or wrong secret token")
+            return 403, "text/plain", b"Forbidden"
+        try:
+            update = Update.de_json(json.loads(request.body), application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"[WEBHOOK] Ignoring a malformed update: {e}")
+            return 400, "text/plain", b"Bad Request"
+        # Answer at once; the application runs the handlers (UPDATE_CONCURRENCY at a time)
+        await application.update_queue.put(update)
+        return 200, "text/plain", b"OK"
+
+    return handle
+
+async def start_updates(application, server=None):
+    """Start receiving updates: a webhook on the health server, or getUpdates polling.
+
+    Webhook mode needs the health server and WEBHOOK_URL; without them the
+    bot falls back to polling.
+    """
+    if webhook_enabled():
+        if server is None or not WEBHOOK_URL:
+            logger.error("[WEBHOOK] TELEGRAM_MODE=webhook needs WEBHOOK_URL and the health server, polling instead")
+        else:
+            secret = webhook_secret(application.bot.token)
+            server.route(WEBHOOK_PATH, webhook_handler(application, secret), methods=("POST",))
+            await application.bot.set_webhook(
+                f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+                secret_token=secret,
+                max_connections=UPDATE_CONCURRENCY,
+                allowed_updates=["message", "callback_query"],
+            )
+            logger.info(f"[WEBHOOK] Receiving updates at {WEBHOOK_URL}{WEBHOOK_PATH} on port {server.port}")
+            return "webhook"
+    # start_polling removes a webhook left over from an earlier webhook run
+    await application.updater.start_polling()
+    return "polling"
+
+async def stop_updates(application):
+    """Stop polling; a webhook stays registered so updates queue up at Telegram until the next start."""
+    if application.updater is not None and application.updater.running:
+        await application.updater.stop()